@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks of the rename pipeline, component by component.
+
+Builds a synthetic session of N workspaces with M windows each and a config
+of R rules (a mix of literal keys, regex keys and ``transform_title`` rules),
+then times ``rename``, ``Labeller.label``, ``transform_title``, ``compress``
+and ``truncate`` separately. Run from the repository root::
+
+    python benchmarks/bench_components.py --workspaces 10 --windows 8 --rules 300
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from i3_workspace_names_daemon import build_rename, compress, truncate  # noqa: E402
+from mocks import AttrDict, MockI3, MockLeaf, MockWorkspace  # noqa: E402
+
+ICONS = ("firefox", "chrome", "terminal", "envelope", "file-pen", "folder-open", "music", "play")
+
+
+def make_mappings(rules, rng):
+    """Config of `rules` rules: 60% literal keys, 25% regex keys, 15% title transforms."""
+    mappings = {}
+    for i in range(rules):
+        kind = rng.random()
+        if kind < 0.6:
+            mappings["app{}".format(i)] = rng.choice(ICONS)
+        elif kind < 0.85:
+            mappings["(org\\.)?vendor{}\\.(app|tool)".format(i)] = rng.choice(ICONS)
+        else:
+            mappings["editor{}".format(i)] = {
+                "transform_title": {
+                    "from": r".*\[(.+?)\].*",
+                    "to": r"\1",
+                    "compress": bool(i % 2),
+                },
+                "icon": rng.choice(ICONS),
+            }
+    mappings["_no_match"] = "question"
+    return mappings
+
+
+def make_leaf(mappings, rng):
+    keys = [key for key in mappings if key != "_no_match"]
+    kind = rng.random()
+    if kind < 0.7 and keys:
+        key = rng.choice(keys)
+        name = key.replace("(org\\.)?", "org.").replace("\\.(app|tool)", ".app")
+        title = "{} - project [some-project_name{}] file.py".format(name, rng.randrange(100))
+        return MockLeaf(None, title, name.lower(), name.capitalize())
+    # unknown window, every rule is tried against every identifier
+    return MockLeaf(None, "untitled document", "unknown", "Unknown")
+
+
+def make_session(workspaces, windows, rules, seed=0):
+    rng = random.Random(seed)
+    mappings = make_mappings(rules, rng)
+    mi3 = MockI3(*[
+        MockWorkspace(num + 1, *[make_leaf(mappings, rng) for _ in range(windows)])
+        for num in range(workspaces)
+    ])
+    args = AttrDict(
+        delimiter="|", number_separator_format="{}: {}", max_title_length=12, uniq=False,
+        ignore_unknown=False, no_match_not_show_name=False, verbose=False,
+    )
+    return mi3, build_rename(mi3, mappings, {}, args)
+
+
+def measure(func, iterations):
+    """Call `func` `iterations` times, return per-call latencies in microseconds."""
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        func()
+        latencies.append((time.perf_counter_ns() - start) / 1000)
+    return sorted(latencies)
+
+
+def report(name, latencies):
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+    total = sum(latencies)
+    print("{:<24} {:>12.0f} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+        name, len(latencies) / total * 1e6, percentile(50), percentile(90), percentile(99)))
+
+
+def cycle(items):
+    while True:
+        yield from items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workspaces", type=int, default=10)
+    parser.add_argument("--windows", type=int, default=8, help="windows per workspace")
+    parser.add_argument("--rules", type=int, default=300)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mi3, rename = make_session(args.workspaces, args.windows, args.rules, args.seed)
+    leaves = [leaf for ws in mi3.workspaces for leaf in ws.leaves()]
+    transforms = [rule for rule in rename.labeller.rules.rules if rule.transform is not None]
+    titles = [leaf.window_title for leaf in leaves]
+    long_title = "i3-workspace_names+daemon " * 20
+
+    print("{} workspaces x {} windows, {} rules ({} title transforms)".format(
+        args.workspaces, args.windows, args.rules, len(transforms)))
+    print("{:<24} {:>12} {:>10} {:>10} {:>10}".format("component", "ops/s", "p50 us", "p90 us", "p99 us"))
+
+    def rename_cold():
+        rename.label_cache.retain(set())
+        rename(mi3)
+
+    report("rename (cold cache)", measure(rename_cold, max(1, args.iterations // 10)))
+    report("rename (warm cache)", measure(lambda: rename(mi3), args.iterations))
+
+    next_leaf = cycle(leaves).__next__
+    report("label", measure(lambda: rename.labeller.label(next_leaf()), args.iterations))
+
+    if transforms:
+        next_rule = cycle(transforms).__next__
+        next_title = cycle(titles).__next__
+        report("transform_title", measure(
+            lambda: rename.labeller.transform_title(next_rule(), next_title()), args.iterations))
+
+    next_title = cycle(titles).__next__
+    report("compress", measure(lambda: compress(next_title()), args.iterations))
+    report("compress (long title)", measure(lambda: compress(long_title), args.iterations))
+    report("truncate", measure(lambda: truncate(next_title(), 12), args.iterations))
+
+
+if __name__ == "__main__":
+    main()
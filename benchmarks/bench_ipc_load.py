@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Measure the daemon end to end against a fake i3 on a Unix socket.
+
+Starts the ``FakeI3Server`` of ``tests/mocks.py`` with W workspaces of M
+windows each and runs the real ``main()`` against it, then opens, retitles
+and moves windows at the given rates. Every change alters a workspace name
+(each app shows the number in its title), so the latency of an event is
+the time until the next rename command arrives; events coalesced into one
+pass share that command. Arguments after ``--`` are passed to the daemon.
+Run from the repository root::
+
+    python benchmarks/bench_ipc_load.py --titles 200 --opens 20 -- --shadow-tree
+"""
+
+import argparse
+import bisect
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from i3_workspace_names_daemon import build_rename, main  # noqa: E402
+from mocks import AttrDict, FakeI3Server, MockI3, MockLeaf, MockWorkspace  # noqa: E402
+
+APPS = {"firefox": "firefox", "chromium-browser": "chrome", "x-terminal-emulator": "terminal"}
+
+# the fake titles a window "<class> <n>"
+MAPPINGS = {
+    app: {"icon": icon, "match_on": "window_class", "transform_title": {"from": r".* (\d+)", "to": r"\1"}}
+    for app, icon in APPS.items()
+}
+
+ARGS = AttrDict(
+    delimiter="|", number_separator_format="{}: {}", max_title_length=12, uniq=False,
+    ignore_unknown=False, no_match_not_show_name=False, verbose=False,
+)
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def stale_workspaces(workspaces):
+    """Count the workspaces whose name differs from a fresh rename pass."""
+    probe = MockI3(*workspaces)
+    build_rename(probe, MAPPINGS, {}, ARGS)(probe)
+    # no command is sent when nothing needs a rename
+    return len([command for command in getattr(probe, "cmd", "").split(";") if command])
+
+
+def drive(server, options, result):
+    if not server.subscribed.wait(10):
+        result["error"] = "the daemon did not subscribe"
+    else:
+        # let the startup pass finish before the storm
+        time.sleep(0.2)
+        result["start"] = time.perf_counter()
+        result["changes"] = server.storm(
+            options.duration, opens=options.opens, titles=options.titles, moves=options.moves,
+        )
+        result["end"] = time.perf_counter()
+        # wait until no more commands arrive
+        count = -1
+        while count != len(server.commands):
+            count = len(server.commands)
+            time.sleep(options.settle)
+    server.emit("shutdown", {"change": "exit"})
+    # i3ipc only stops on a shutdown event when subscribed to it, and on
+    # a closed socket otherwise
+    time.sleep(0.1)
+    server.close()
+
+
+def report(server, result):
+    if "error" in result:
+        print(result["error"])
+        return
+    start, end = result["start"], result["end"]
+    times = [t for t in server.command_times if t >= start]
+    events = [t for t, name, _ in server.emitted if name == "window" and t >= start]
+    latencies = []
+    for t in events:
+        index = bisect.bisect_left(times, t)
+        if index < len(times):
+            latencies.append(times[index] - t)
+    latencies.sort()
+    print("window events:    {} in {:.2f} s ({:.0f}/s)".format(
+        len(events), end - start, len(events) / (end - start)))
+    print("rename commands:  {} ({:.2f} per event)".format(
+        len(times), len(times) / max(1, len(events))))
+    print("latency (ms):     p50 {:.2f}  p90 {:.2f}  p99 {:.2f}  max {:.2f}".format(
+        *(1000 * percentile(latencies, p) for p in (50, 90, 99, 100))))
+    print("unanswered:       {}".format(len(events) - len(latencies)))
+    print("stale workspaces: {}".format(stale_workspaces(server.workspaces)))
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workspaces", type=int, default=10)
+    parser.add_argument("--windows", type=int, default=5, help="windows per workspace at start")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds")
+    parser.add_argument("--opens", type=float, default=5.0, help="windows opened per second")
+    parser.add_argument("--titles", type=float, default=100.0, help="title changes per second")
+    parser.add_argument("--moves", type=float, default=5.0, help="windows moved per second")
+    parser.add_argument("--settle", type=float, default=0.5,
+                        help="seconds without commands that end the run")
+    argv = sys.argv[1:]
+    daemon_args = argv[argv.index("--") + 1:] if "--" in argv else []
+    options = parser.parse_args(argv[:argv.index("--")] if "--" in argv else argv)
+
+    apps = list(APPS)
+    workspaces = []
+    for num in range(1, options.workspaces + 1):
+        workspace = MockWorkspace(num, *[
+            MockLeaf(apps[(num + i) % len(apps)]) for i in range(options.windows)
+        ])
+        workspace.name = str(num)
+        workspaces.append(workspace)
+
+    with tempfile.TemporaryDirectory() as tmp, FakeI3Server(*workspaces, apps=apps) as server:
+        config_path = os.path.join(tmp, "app-icons.json")
+        with open(config_path, "w") as f:
+            json.dump(MAPPINGS, f)
+        os.environ["I3SOCK"] = server.path
+        os.environ["XDG_CACHE_HOME"] = tmp
+        sys.argv = ["i3-workspace-names-daemon", "-config-path", config_path] + daemon_args
+        result = {}
+        threading.Thread(target=drive, args=(server, options, result), daemon=True).start()
+        # the daemon installs signal handlers, which only works on the main thread
+        try:
+            main()
+        except EOFError:
+            # the asyncio connection of i3ipc ends with the socket
+            pass
+        report(server, result)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Compare the compiled RuleSet against a plain per-key ``re.match`` scan.
+
+Run from the repository root::
+
+    python benchmarks/bench_rules.py [rule counts ...]
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from i3_workspace_names_daemon import RuleSet  # noqa: E402
+
+
+def make_mappings(count):
+    mappings = {}
+    for i in range(count):
+        if i % 4 == 0:
+            mappings["app-{}-(beta|nightly)".format(i)] = "play"
+        elif i % 4 == 1:
+            mappings[".*- project{}$".format(i)] = "file-pen"
+        else:
+            mappings["app{}".format(i)] = "terminal"
+    return mappings
+
+
+def scan(mappings, name):
+    for index, name_re in enumerate(mappings):
+        if re.match(name_re, name, re.IGNORECASE):
+            return index
+    return None
+
+
+def main(counts):
+    # five identifiers per leaf, most of them never match anything
+    names = ["Mozilla Firefox", "some title - editor", "navigator", "Firefox", "unknown"]
+    print("{:>6} {:>14} {:>16} {:>8}".format("rules", "scan us/leaf", "ruleset us/leaf", "speedup"))
+    for count in counts:
+        mappings = make_mappings(count)
+        rules = RuleSet(mappings)
+        number = max(1, 20000 // count)
+        t_scan = timeit.timeit(lambda: [scan(mappings, n) for n in names], number=number)
+        t_rules = timeit.timeit(lambda: [rules.match(n) for n in names], number=number)
+        print("{:>6} {:>14.2f} {:>16.2f} {:>7.1f}x".format(
+            count, t_scan / number * 1e6, t_rules / number * 1e6, t_scan / t_rules))
+
+
+if __name__ == "__main__":
+    main([int(c) for c in sys.argv[1:]] or [10, 50, 100, 300, 1000])
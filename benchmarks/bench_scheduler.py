@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Count renames and IPC calls for a simulated burst of events.
+
+The burst opens a layout of windows and then lets terminals churn their
+titles, one event per millisecond. Run from the repository root::
+
+    python benchmarks/bench_scheduler.py [debounce ms ...]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from i3_workspace_names_daemon import build_rename  # noqa: E402
+from mocks import AttrDict, MockI3, MockLeaf, MockWorkspace  # noqa: E402
+
+MAPPINGS = {
+    "firefox": "firefox",
+    "urxvt": {"transform_title": {"from": r".*:(.*)", "to": r"\1"}, "icon": "terminal"},
+}
+
+
+class CountingI3(MockI3):
+    def __init__(self, *workspaces):
+        super().__init__(*workspaces)
+        self.command_calls = 0
+
+    def command(self, cmd):
+        self.command_calls += 1
+        super().command(cmd)
+
+
+def run(debounce_ms, windows=20, titles=200):
+    args = AttrDict(
+        delimiter="|", number_separator_format="{}: {}", max_title_length=12, uniq=False,
+        ignore_unknown=False, no_match_not_show_name=False, verbose=False, debounce_ms=debounce_ms,
+    )
+    leaves = []
+    workspace = MockWorkspace(1)
+    i3 = CountingI3(workspace)
+    rename = build_rename(i3, MAPPINGS, {}, args)
+    for i in range(windows):
+        leaf = MockLeaf("firefox") if i % 2 else MockLeaf("urxvt", "user@host:~")
+        leaves.append(leaf)
+        workspace.leaves_ = tuple(leaves)
+        rename(i3, AttrDict(change="new", container=leaf))
+        time.sleep(0.001)
+    terminals = [leaf for leaf in leaves if leaf.name == "urxvt"]
+    for i in range(titles):
+        leaf = terminals[i % len(terminals)]
+        leaf.window_title = "user@host:~/src/{}".format(i)
+        rename(i3, AttrDict(change="title", container=leaf))
+        time.sleep(0.001)
+    # let the trailing edge run
+    time.sleep(debounce_ms / 1000 * 2 + 0.05)
+    return windows + titles, i3.get_tree_calls, i3.command_calls
+
+
+def main(debounces):
+    print("{:>11} {:>7} {:>9} {:>9}".format("debounce ms", "events", "get_tree", "command"))
+    for debounce_ms in debounces:
+        print("{:>11} {:>7} {:>9} {:>9}".format(debounce_ms, *run(debounce_ms)))
+
+
+if __name__ == "__main__":
+    main([int(d) for d in sys.argv[1:]] or [0, 10, 50, 100])
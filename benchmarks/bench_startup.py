@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Time loading the app-icon config with and without the compiled config cache.
+
+Writes a config of R rules to a temporary directory, then loads it with a
+cold cache (parse, validate, look up icons, write the cache) and with a warm
+one, up to building the rename callback. Run from the repository root::
+
+    python benchmarks/bench_startup.py [rule counts ...]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import i3_workspace_names_daemon as daemon  # noqa: E402
+
+ICONS = ("firefox", "chrome", "terminal", "envelope", "file-pen", "folder-open", "music", "play")
+
+
+def make_config(count):
+    # the literal keys end with a letter, so none is a prefix of a later one
+    # and shadows it
+    config = {}
+    for i in range(count):
+        if i % 5 == 4:
+            config["editor{}x".format(i)] = {
+                "transform_title": {"from": r".*\[(.+?)\].*", "to": r"\1"},
+                "icon": ICONS[i % len(ICONS)],
+            }
+        elif i % 5 == 3:
+            config["(org\\.)?vendor{}\\.app".format(i)] = ICONS[i % len(ICONS)]
+        else:
+            config["app{}x".format(i)] = ICONS[i % len(ICONS)]
+    config["1"] = {"icon": "terminal", "name": "shell"}
+    return config
+
+
+def start(config_path):
+    mappings, ws, icons = daemon._load_config(config_path)
+    args = argparse_defaults()
+    daemon.build_rename(None, mappings, ws, args, icons)
+
+
+def argparse_defaults():
+    class Args:
+        number_separator_format = "{}: {}"
+        delimiter = "|"
+        max_title_length = 12
+        uniq = ignore_unknown = no_match_not_show_name = verbose = False
+    return Args()
+
+
+def main(counts):
+    print("{:>6} {:>10} {:>10} {:>8}".format("rules", "cold ms", "cached ms", "speedup"))
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["XDG_CACHE_HOME"] = os.path.join(tmp, "cache")
+        cache_dir = os.path.join(tmp, "cache", "i3-workspace-names-daemon")
+        for count in counts:
+            config_path = os.path.join(tmp, "app-icons-{}.json".format(count))
+            with open(config_path, "w") as f:
+                json.dump(make_config(count), f)
+            number = 20
+
+            def cold():
+                for name in os.listdir(cache_dir) if os.path.isdir(cache_dir) else ():
+                    os.remove(os.path.join(cache_dir, name))
+                start(config_path)
+
+            t_cold = timeit.timeit(cold, number=number) / number
+            start(config_path)
+            t_cached = timeit.timeit(lambda: start(config_path), number=number) / number
+            print("{:>6} {:>10.2f} {:>10.2f} {:>7.1f}x".format(
+                count, t_cold * 1e3, t_cached * 1e3, t_cold / t_cached))
+
+
+if __name__ == "__main__":
+    main([int(c) for c in sys.argv[1:]] or [10, 100, 500])
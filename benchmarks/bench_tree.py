@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Compare reading a GET_TREE reply with i3ipc and with `parse_tree`.
+
+Builds the reply of i3 for N workspaces with M windows each (every field
+i3 sends, see ``tests/mocks.py``), then times decoding it and collecting the
+windows of every workspace, and measures the peak allocation of one read.
+Run from the repository root::
+
+    python benchmarks/bench_tree.py [window counts ...]
+"""
+
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+import i3ipc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+from i3_workspace_names_daemon import parse_tree  # noqa: E402
+from mocks import MockLeaf, MockWorkspace, tree_reply  # noqa: E402
+
+WORKSPACES = 10
+
+
+def read_i3ipc(data):
+    tree = i3ipc.Con(json.loads(data), None, None)
+    return [ws.leaves() for ws in tree.workspaces()]
+
+
+def read_lean(data):
+    return [ws.leaves() for ws in parse_tree(data).workspaces()]
+
+
+def peak(read, data):
+    tracemalloc.start()
+    read(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main(counts):
+    print("{:>8} {:>9} {:>11} {:>11} {:>13} {:>13}".format(
+        "windows", "reply KiB", "i3ipc ms", "lean ms", "i3ipc peak KiB", "lean peak KiB"))
+    for count in counts:
+        workspaces = [
+            MockWorkspace(num, *[
+                MockLeaf("app{}".format(i), "document {} - editor".format(i))
+                for i in range(count // WORKSPACES)
+            ])
+            for num in range(1, WORKSPACES + 1)
+        ]
+        data = tree_reply(workspaces)
+        number = max(1, 2000 // count)
+        times = [
+            timeit.timeit(lambda: read(data), number=number) / number
+            for read in (read_i3ipc, read_lean)
+        ]
+        print("{:>8} {:>9.0f} {:>11.2f} {:>11.2f} {:>13.0f} {:>13.0f}".format(
+            count, len(data) / 1024, times[0] * 1e3, times[1] * 1e3,
+            peak(read_i3ipc, data) / 1024, peak(read_lean, data) / 1024))
+
+
+if __name__ == "__main__":
+    main([int(c) for c in sys.argv[1:]] or [50, 200, 500, 1000])
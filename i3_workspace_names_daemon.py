@@ -4,10 +4,18 @@
 import json
 import os.path
 import argparse
+import hashlib
+import importlib.util
 import re
+import signal
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import chain
 import i3ipc
-from sys import stderr, argv
-from fa_icons import icons as fa_icons
+from sys import stderr, stdin, stdout, argv
 
 
 I3_CONFIG_PATHS = tuple(
@@ -22,6 +30,18 @@ I3_CONFIG_PATHS = tuple(
     )
 )
 
+# window attributes used to find a mapping, in order of priority
+WINDOW_IDENTIFIERS = ("name", "window_title", "window_instance", "window_class", "app_id")
+
+# events after which the workspaces are renamed
+RENAME_EVENTS = (
+    *["window::{}".format(ev) for ev in ("move", "new", "title", "close")],
+    "workspace::init",
+)
+
+# events only needed to keep the shadow tree up to date
+SHADOW_TREE_EVENTS = ("workspace::empty", "workspace::rename")
+
 DEFAULT_APP_ICON_CONFIG = {
     "chromium-browser": "chrome",
     "firefox": "firefox",
@@ -35,156 +55,2067 @@ DEFAULT_APP_ICON_CONFIG = {
 }
 
 
+def load_fa_icons(names):
+    """Look up the glyphs of the font-awesome icons `names`.
+
+    Only the requested entries are read from the generated ``fa_icons``
+    module, the table of all icons is neither imported nor kept in memory.
+
+    Parameters
+    ----------
+    names: `Iterable[str]`
+        Icon names, unknown ones are left out of the result.
+
+    Returns
+    -------
+    dict[str, str]
+        Index of icon-name to glyph.
+    """
+    names = sorted(set(names))
+    if not names:
+        return {}
+    spec = importlib.util.find_spec("fa_icons")
+    if spec is None or spec.origin is None or not spec.origin.endswith(".py"):
+        # e.g. only the byte-compiled module is installed
+        from fa_icons import icons
+        return {name: icons[name] for name in names if name in icons}
+    with open(spec.origin, encoding="ascii") as f:
+        source = f.read()
+    # the lines written by `generate_icons`
+    entry_re = re.compile(
+        r'^    "({})": u"\\u([0-9a-fA-F]{{4}})",$'.format("|".join(map(re.escape, names))),
+        re.MULTILINE,
+    )
+    return {match[1]: chr(int(match[2], 16)) for match in entry_re.finditer(source)}
+
+
+def _referenced_icons(*configs):
+    # every string that could be an icon-name, pango markup is simply not found
+    names = set()
+    for config in configs:
+        for value in config.values():
+            if isinstance(value, dict):
+                value = value.get("icon")
+            if isinstance(value, str):
+                names.add(value)
+    return names
+
+
 def truncate(text, length, ellipsis="…"):
     if len(text) <= length:
         return text
     return text[:length] + ellipsis
 
 
+_COMPRESS_PATTERNS = {}
+
+
 def compress(text, length=3):
-    ret = ""
-    matches = re.finditer(r"[a-zA-Z0-9]+", text)
-    for match in matches:
-        ret += match[0][:length]
-        if match.end() < (len(text) - 1):
-            ret += text[match.end()]
+    # the first `length` characters of every alphanumeric word, each followed by
+    # the character after the word unless that is the last one of `text`
+    pattern = _COMPRESS_PATTERNS.get(length)
+    if pattern is None:
+        pattern = _COMPRESS_PATTERNS[length] = re.compile(
+            r"(?=[a-zA-Z0-9])([a-zA-Z0-9]{{0,{}}})[a-zA-Z0-9]*(?:([^a-zA-Z0-9])(?!\Z))?".format(
+                max(length, 0)
+            )
+        )
+    return "".join(chain.from_iterable(pattern.findall(text)))
 
-    return ret
 
+# constructs that change meaning (or do not compile) once a key is embedded in a
+# larger alternation: backreferences, named groups, conditionals, global flags
+# (anywhere, before Python 3.11 they only warn when not at the start).
+_UNSHARABLE_RE = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?\(|\(\?[aiLmsux]+\)")
 
-def build_rename(i3, mappings, fixed_ws, args):
-    """Build rename callback function to pass to i3ipc.
+_RE_METACHARACTERS = frozenset(".^$*+?{}[]|()\\")
+
+
+def _is_sharable(name_re):
+    return _UNSHARABLE_RE.search(name_re) is None
+
+
+def _literal_key(name_re):
+    """Classify an application-name key.
+
+    Returns
+    -------
+    tuple[str, bool] or None
+        The lower-cased literal text and whether it must match the whole name
+        (a trailing ``$``) rather than just a prefix, or None if `name_re` is a
+        real regular expression.
+    """
+    if not name_re.isascii():
+        return None
+    text = name_re[1:] if name_re.startswith("^") else name_re
+    exact = text.endswith("$")
+    if exact:
+        text = text[:-1]
+    literal = []
+    escaped = False
+    for char in text:
+        if escaped:
+            if char.isalnum():
+                # \d, \w, \b, ... are classes or assertions, not literals
+                return None
+            literal.append(char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char in _RE_METACHARACTERS:
+            return None
+        else:
+            literal.append(char)
+    if escaped:
+        return None
+    return "".join(literal).lower(), exact
+
+
+def _required_prefix(name_re):
+    """Lower-cased text every name matched by the key `name_re` starts with.
+
+    Only the leading literal characters of the key count, the result is ""
+    whenever that is not certain (e.g. an alternation or a non-ascii key).
+    """
+    literal = _literal_key(name_re)
+    if literal is not None:
+        return literal[0]
+    if not name_re.isascii():
+        return ""
+    # an alternation outside of groups and classes makes every branch optional
+    depth = 0
+    escaped = False
+    # index of the first character of the current class, None outside of one
+    class_start = None
+    for position, char in enumerate(name_re):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif class_start is not None:
+            # "]" right after "[" or "[^" is a literal
+            if char == "]" and position > class_start:
+                class_start = None
+        elif char == "[":
+            class_start = position + 1
+            if name_re.startswith("^", class_start):
+                class_start += 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return ""
+    prefix = []
+    text = name_re[1:] if name_re.startswith("^") else name_re
+    for char in text:
+        if char in _RE_METACHARACTERS:
+            # the previous character may occur zero times
+            if char in "?*{" and prefix:
+                prefix.pop()
+            break
+        prefix.append(char)
+    return "".join(prefix).lower()
+
+
+def _shadowed_rules(mappings):
+    """Find the keys of `mappings` that can never be the first matching rule.
+
+    A key is shadowed by an earlier literal key without ``$`` (a prefix) when
+    every name it matches starts with that prefix, or by an earlier literal
+    key with ``$`` matching the same single name. The earlier key has to
+    apply to all the window identifiers the later one applies to, see
+    ``match_on``.
+
+    Returns
+    -------
+    list[tuple[str, str]]
+        The shadowed key and the earlier key shadowing it, in config order.
+    """
+    def scope(mapping):
+        match_on = mapping.get("match_on") if isinstance(mapping, dict) else None
+        if not match_on:
+            return frozenset(WINDOW_IDENTIFIERS)
+        return frozenset([match_on] if isinstance(match_on, str) else match_on)
+
+    # (key, text, exact, scope) of the literal keys so far
+    literals = []
+    shadowed = []
+    for key, mapping in mappings.items():
+        if key == "_no_match":
+            continue
+        literal = _literal_key(key)
+        text, exact = literal if literal is not None else (_required_prefix(key), False)
+        applies = scope(mapping)
+        for earlier, earlier_text, earlier_exact, earlier_applies in literals:
+            if not applies <= earlier_applies:
+                continue
+            if (
+                (earlier_exact and exact and text == earlier_text)
+                or (not earlier_exact and text.startswith(earlier_text))
+            ):
+                shadowed.append((key, earlier))
+                break
+        if literal is not None:
+            literals.append((key, text, exact, applies))
+    return shadowed
+
+
+def _glyph(icon_name, icons):
+    # pango markup is used as is
+    if icon_name.startswith("<"):
+        return icon_name
+    return icons.get(icon_name)
+
+
+class Rule:
+    """A mapping of the config with everything resolved that does not depend on the window.
+
+    Attributes
+    ----------
+    key: `str`
+        The application-name regex.
+    icon: `str|None`
+        The glyph or pango markup to show, None if the icon is unknown.
+    transform: `re.Pattern|None`
+        The anchored ``transform_title.from`` regex, None without a title transformation.
+    transform_to: `str`
+        Replacement for `transform`.
+    transform_on: `str`
+        Window attribute the title transformation applies to.
+    compress: `bool`
+        Whether to `compress` the transformed title.
+    match_on: `tuple[str]|None`
+        The window identifiers the key is matched against, None for all of them.
+    """
+
+    __slots__ = ("key", "icon", "transform", "transform_to", "transform_on", "compress", "match_on")
+
+    def __init__(self, key, mapping, icons):
+        self.key = key
+        self.icon = None
+        self.transform = None
+        self.transform_to = ""
+        self.transform_on = "window_title"
+        self.compress = False
+        self.match_on = None
+        if isinstance(mapping, str):
+            self.icon = _glyph(mapping, icons)
+        elif isinstance(mapping, dict):
+            # it could be a dict, have the icon but not transform_title
+            self.icon = _glyph(mapping.get("icon") or "", icons)
+            tt = mapping.get("transform_title")
+            if tt:
+                self.transform = re.compile("^" + tt["from"] + "$")
+                self.transform_to = tt["to"]
+                self.transform_on = tt.get("on", "window_title")
+                self.compress = bool(tt.get("compress", False))
+            match_on = mapping.get("match_on")
+            if match_on:
+                self.match_on = (match_on,) if isinstance(match_on, str) else tuple(match_on)
+
+
+def _compile_run(keys):
+    """Compile the alternation of the regex `keys`, see `RuleSet`.
+
+    Returns
+    -------
+    tuple[re.Pattern, tuple[int]|None]
+        The pattern and the number of the group wrapping every key, None for
+        a single key, which is compiled on its own.
+    """
+    if len(keys) == 1:
+        return re.compile(keys[0], re.IGNORECASE), None
+    groups = []
+    group = 1
+    for key in keys:
+        groups.append(group)
+        group += 1 + re.compile(key).groups
+    pattern = "|".join("({})".format(key) for key in keys)
+    return re.compile(pattern, re.IGNORECASE), tuple(groups)
+
+
+class _KeyIndex:
+    """Index of the keys at `indices` (ascending) of `keys`, see `RuleSet`.
+
+    The patterns are compiled by `compile_run`, like `_compile_run`.
+    """
+
+    def __init__(self, keys, indices, compile_run=_compile_run):
+        self.keys = keys
+        self.indices = indices
+        self._compile_run = compile_run
+        self._exact = {}
+        self._prefixes = {}
+        regexes = []
+        for index in indices:
+            literal = _literal_key(keys[index])
+            if literal is None:
+                regexes.append(index)
+                continue
+            text, exact = literal
+            # on duplicate (case-insensitive) keys the earlier one wins
+            (self._exact if exact else self._prefixes).setdefault(text, index)
+        self._prefix_lengths = sorted({len(text) for text in self._prefixes})
+        self._regex_chunks = self._compile(regexes)
+        # literals only agree with IGNORECASE matching for ascii names, anything
+        # else goes through the compiled form of every key, built on first use.
+        self._chunks = None
+
+    def _compile(self, indices):
+        # list of (compiled pattern, {group index: rule index} or None, first rule index)
+        chunks = []
+        run = []
+        for index in indices:
+            if _is_sharable(self.keys[index]):
+                run.append(index)
+                continue
+            self._add_run(chunks, run)
+            run = []
+            self._add_run(chunks, [index])
+        self._add_run(chunks, run)
+        return chunks
+
+    def _add_run(self, chunks, run):
+        if not run:
+            return
+        pattern, groups = self._compile_run(tuple(self.keys[index] for index in run))
+        chunks.append((pattern, None if groups is None else dict(zip(groups, run)), run[0]))
+
+    def _match_literal(self, name):
+        lowered = name.lower()
+        best = self._exact.get(lowered)
+        # like "$", an exact key also matches in front of a trailing newline
+        if lowered.endswith("\n"):
+            index = self._exact.get(lowered[:-1])
+            if index is not None and (best is None or index < best):
+                best = index
+        for length in self._prefix_lengths:
+            if length > len(lowered):
+                break
+            index = self._prefixes.get(lowered[:length])
+            if index is not None and (best is None or index < best):
+                best = index
+        return best
+
+    @staticmethod
+    def _match_chunks(chunks, name, limit=None):
+        for pattern, groups, first in chunks:
+            if limit is not None and first >= limit:
+                break
+            match = pattern.match(name)
+            if match:
+                # the wrapping group of the winning branch is always closed last
+                return first if groups is None else groups[match.lastindex]
+        return None
+
+    def match(self, name):
+        if not name.isascii():
+            if self._chunks is None:
+                self._chunks = self._compile(self.indices)
+            return self._match_chunks(self._chunks, name)
+        best = self._match_literal(name)
+        # only regexes defined before the best literal can still win
+        index = self._match_chunks(self._regex_chunks, name, best)
+        if index is not None and (best is None or index < best):
+            return index
+        return best
+
+
+class RuleSet:
+    """Compiled, ordered index of the application-name regexes of a config.
+
+    Matching keeps the semantics of trying ``re.match(key, name, re.IGNORECASE)``
+    for every key in config order and stopping at the first hit, without running
+    every key for every name:
+
+    - keys without regex metacharacters are plain literals; they go into hash
+      indexes of exact names (``"^firefox$"``) and name prefixes (``"firefox"``,
+      since ``re.match`` only anchors at the start) on the lower-cased name,
+    - the remaining keys are compiled once, and runs of consecutive keys are
+      joined into a single alternation. ``re.match`` anchors every branch at the
+      same position and tries them left to right, so the branch that matches is
+      the earliest rule.
+
+    Rules with a ``match_on`` list only apply to those window identifiers.
+    If there are any, every identifier gets an index of its own holding the
+    rules without ``match_on`` and the rules scoped to it.
 
     Parameters
     ----------
-    i3: `i3ipc.i3ipc.Connection`
     mappings: `dict[str, Union[dict, str]]`
-        Index of application-name regex (from i3) to icon-name (in font-awesome gallery).
-    fixed_ws: `dict[str, Union[dict, str]]`
-        Workspace mapping with fixed icon/title
-    delim: `str`
-        Delimiter to use when build workspace name from app names/icons.
+        Index of application-name regex (from i3) to icon-name or mapping.
+    icons: `dict[str, str]|None`
+        Index of icon-name to glyph, looked up with `load_fa_icons` if None.
+    compiled: `dict[str, Rule]|None`
+        Rules of a previous config to reuse, by key, for keys whose mapping did
+        not change.
+    patterns: `dict|None`
+        The `patterns` of a previous `RuleSet`, the alternations of the same
+        keys are not compiled again.
+
+    Attributes
+    ----------
+    rules: `list[Rule]`
+        The compiled mappings, in config order.
+    patterns: `dict[tuple[str], tuple]`
+        The compiled alternations in use, by their keys, see `_compile_run`.
+    """
+
+    def __init__(self, mappings, icons=None, compiled=None, patterns=None):
+        if icons is None:
+            icons = load_fa_icons(_referenced_icons(mappings))
+        compiled = compiled or {}
+        self._previous_patterns = patterns or {}
+        self.patterns = {}
+        self.keys = list(mappings)
+        self.rules = [
+            compiled[key] if key in compiled else Rule(key, mappings[key], icons)
+            for key in self.keys
+        ]
+        self._index = _KeyIndex(self.keys, range(len(self.keys)), self._compile_run)
+        self.profile = None
+        self._scoped = {}
+        if any(rule.match_on for rule in self.rules):
+            for identifier in WINDOW_IDENTIFIERS:
+                self._scoped[identifier] = _KeyIndex(self.keys, [
+                    index for index, rule in enumerate(self.rules)
+                    if not rule.match_on or identifier in rule.match_on
+                ], self._compile_run)
+        # only needed while building
+        self._previous_patterns = {}
+
+    def _compile_run(self, keys):
+        compiled = self.patterns.get(keys) or self._previous_patterns.get(keys)
+        if compiled is None:
+            compiled = _compile_run(keys)
+        self.patterns[keys] = compiled
+        return compiled
+
+    def __len__(self):
+        return len(self.keys)
+
+    def match(self, name, identifier=None):
+        """Return the index of the first rule matching `name`, or None.
+
+        With an `identifier` only the rules applying to that window identifier
+        are considered.
+        """
+        return self._scoped.get(identifier, self._index).match(name)
+
+    def enable_profile(self):
+        """Match every key on its own from now on, counting into the `RuleProfile` `profile`.
+
+        Matching then tries the keys one after the other like ``re.match``
+        would, which is slower than the shared indexes but shows the cost of
+        every key.
+        """
+        self.profile = RuleProfile(self.keys)
+        self.match = self._profiled_match
+
+    def _profiled_match(self, name, identifier=None):
+        return self.profile.match(name, self._scoped.get(identifier, self._index).indices)
+
+    def applies_to(self, identifier):
+        """Return whether any rule is matched against the window identifier `identifier`.
+
+        The reserved ``_no_match`` key is not counted.
+        """
+        index = self._scoped.get(identifier, self._index)
+        return any(self.keys[i] != "_no_match" for i in index.indices)
+
+
+def _matching_any(keys):
+    """Return a predicate for `LabelCache.invalidate` telling whether any of
+    the window identifiers it is given matches one of the keys `keys`.
+    """
+    rules = RuleSet(dict.fromkeys(keys, ""), {})
+
+    def matches(identifiers):
+        return any(rules.match(name) is not None for name in identifiers if name is not None)
+
+    return matches
+
+
+class RuleProfile:
+    """Attempts, hits and cumulative match time of every key of a `RuleSet`.
+
+    Attributes
+    ----------
+    attempts, hits: `list[int]`
+        Names matched against every key, and names it matched, by rule index.
+    seconds: `list[float]`
+        Time spent matching names against every key, by rule index.
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.attempts = [0] * len(keys)
+        self.hits = [0] * len(keys)
+        self.seconds = [0.0] * len(keys)
+        self._patterns = [re.compile(key, re.IGNORECASE) for key in keys]
+
+    def match(self, name, indices):
+        """Return the first of the rules at `indices` matching `name`, or None."""
+        clock = time.perf_counter
+        for index in indices:
+            start = clock()
+            found = self._patterns[index].match(name) is not None
+            self.seconds[index] += clock() - start
+            self.attempts[index] += 1
+            if found:
+                self.hits[index] += 1
+                return index
+        return None
+
+    def as_dict(self):
+        """The counters of every key that was tried, the most expensive first."""
+        ranking = sorted(
+            (index for index, attempts in enumerate(self.attempts) if attempts),
+            key=lambda index: self.seconds[index],
+            reverse=True,
+        )
+        return [
+            {
+                "rule": self.keys[index],
+                "attempts": self.attempts[index],
+                "hits": self.hits[index],
+                "seconds": round(self.seconds[index], 6),
+            }
+            for index in ranking
+        ]
+
+
+_MISSING = object()
+
+# identifiers shown for a window no rule matches
+_FALLBACK_POSITIONS = tuple(
+    WINDOW_IDENTIFIERS.index(identifier) for identifier in ("window_class", "app_id")
+)
+
+
+def _changed_keys(old, new):
+    """Keys of the mappings `old` and `new` whose rule was added, removed or changed.
+
+    Returns None when the order of the common keys changed, as the first
+    matching rule of any window may then be a different one.
+    """
+    if [key for key in old if key in new] != [key for key in new if key in old]:
+        return None
+    return {
+        key for key in old.keys() | new.keys()
+        if old.get(key, _MISSING) != new.get(key, _MISSING)
+    }
+
+
+class LabelCache:
+    """Last computed label of every window.
+
+    Entries are keyed by container id and remember the window identifiers the
+    label was computed from, so a lookup only recomputes the label of windows
+    whose identifiers changed since the previous rename. Windows without a
+    container id are never cached.
+
+    `compute` returns the label of a window together with the positions in
+    `WINDOW_IDENTIFIERS` of the identifiers it depends on, or None if that is
+    not known. A change of any other identifier keeps the cached label.
+
+    Attributes
+    ----------
+    hits: `int`
+        Lookups answered from the cache.
+    misses: `int`
+        Labels that had to be computed.
+    short_circuits: `int`
+        Windows `unaffected` by a change of their identifiers.
+    """
+
+    def __init__(self, compute):
+        self._compute = compute
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.short_circuits = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _identifiers(leaf):
+        return tuple(getattr(leaf, attr, None) for attr in WINDOW_IDENTIFIERS)
+
+    @staticmethod
+    def _valid(entry, identifiers):
+        old, _, depends = entry
+        if depends is None:
+            return old == identifiers
+        return all(old[position] == identifiers[position] for position in depends)
+
+    def get(self, leaf):
+        con_id = getattr(leaf, "id", None)
+        identifiers = self._identifiers(leaf)
+        entry = self._entries.get(con_id)
+        if entry is not None and self._valid(entry, identifiers):
+            self.hits += 1
+            if entry[0] != identifiers:
+                self._entries[con_id] = (identifiers,) + entry[1:]
+            return entry[1]
+        self.misses += 1
+        label, depends = self._compute(leaf)
+        if con_id is not None:
+            self._entries[con_id] = (identifiers, label, depends)
+        return label
+
+    def unaffected(self, leaf):
+        """Return whether the cached label of `leaf` is still valid.
+
+        True when only identifiers the label does not depend on changed.
+        """
+        entry = self._entries.get(getattr(leaf, "id", None))
+        if entry is None or not self._valid(entry, self._identifiers(leaf)):
+            return False
+        self.short_circuits += 1
+        return True
+
+    def refresh(self, leaf):
+        """Recompute the label of `leaf` and return it."""
+        self.evict(getattr(leaf, "id", None))
+        return self.get(leaf)
+
+    def peek(self, con_id, default=None):
+        """Return the cached label of window `con_id` without computing it."""
+        entry = self._entries.get(con_id)
+        return default if entry is None else entry[1]
+
+    def evict(self, con_id):
+        self._entries.pop(con_id, None)
+
+    def retain(self, con_ids):
+        """Drop the entries of all windows not in `con_ids`."""
+        for con_id in self._entries.keys() - con_ids:
+            self.evict(con_id)
+
+    def as_dict(self):
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "short_circuits": self.short_circuits,
+        }
+
+    def invalidate(self, stale=None):
+        """Drop the entries whose identifiers `stale` returns True for, or all of them.
+
+        Returns the number of entries dropped.
+        """
+        dropped = [
+            con_id for con_id, (identifiers, _, _) in self._entries.items()
+            if stale is None or stale(identifiers)
+        ]
+        for con_id in dropped:
+            self.evict(con_id)
+        return len(dropped)
+
+
+class LRUMemo:
+    """Bounded memo of `function`, evicting the least recently used results.
+
+    Parameters
+    ----------
+    function: `callable`
+        Function of hashable positional arguments.
+    maxsize: `int`
+        Maximum number of results kept, 0 disables the memo.
+
+    Attributes
+    ----------
+    hits, misses, evictions: `int`
+        Calls answered from the memo, calls of `function` and results dropped
+        to make room.
+    """
+
+    def __init__(self, function, maxsize=1024):
+        self._function = function
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __call__(self, *key):
+        try:
+            value = self._entries[key]
+        except KeyError:
+            pass
+        else:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = self._function(*key)
+        if self.maxsize > 0:
+            self._entries[key] = value
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def as_dict(self):
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class WindowRecord:
+    """The identifiers of a window, as far as labelling is concerned."""
+
+    __slots__ = ("id", "workspace") + WINDOW_IDENTIFIERS
+
+    def __init__(self, con, workspace):
+        self.id = con.id
+        self.workspace = workspace
+        self.update(con)
+
+    def update(self, con):
+        for attr in WINDOW_IDENTIFIERS:
+            setattr(self, attr, getattr(con, attr, None))
+
+
+class WorkspaceRecord:
+    """A workspace and its windows, in the order of `i3ipc.Con.leaves`."""
+
+    __slots__ = ("id", "num", "name", "windows")
+
+    def __init__(self, con):
+        self.id = con.id
+        self.num = con.num
+        self.name = con.name
+        self.windows = []
+
+    def leaves(self):
+        return self.windows
+
+
+class ShadowTree:
+    """In-memory model of the workspaces and their windows.
+
+    The model is kept up to date from the containers carried by events, so
+    most renames need no ``get_tree``. It only has to be synchronised with a
+    full tree again when an event cannot be applied: i3 does not say on which
+    workspace a new window was opened or where a window was moved to. The
+    model is also resynchronised every `resync_interval` seconds in case an
+    event was missed.
+
+    Workspaces touched by an event are marked dirty, only those are renamed.
+
+    Parameters
+    ----------
+    resync_interval: `float`
+        Maximum age of the last full synchronisation in seconds.
+    """
+
+    def __init__(self, resync_interval=60.0):
+        self.resync_interval = resync_interval
+        self.workspaces = {}
+        self.windows = {}
+        self.dirty = set()
+        self.syncs = 0
+        self._synced_at = None
+
+    @property
+    def stale(self):
+        return (
+            self._synced_at is None
+            or time.monotonic() - self._synced_at > self.resync_interval
+        )
+
+    def invalidate(self):
+        self._synced_at = None
+
+    def sync(self, tree):
+        """Rebuild the model from `tree`, marking every workspace dirty."""
+        self.workspaces = {}
+        self.windows = {}
+        for con in tree.workspaces():
+            workspace = self.workspaces[con.id] = WorkspaceRecord(con)
+            for leaf in con.leaves():
+                window = self.windows[leaf.id] = WindowRecord(leaf, workspace)
+                workspace.windows.append(window)
+        self.dirty = set(self.workspaces)
+        self.syncs += 1
+        self._synced_at = time.monotonic()
+
+    def take_dirty(self):
+        """Return the dirty workspaces (in tree order) and mark them clean."""
+        workspaces = [ws for ws_id, ws in self.workspaces.items() if ws_id in self.dirty]
+        self.dirty = set()
+        return workspaces
+
+    def touch(self, con_id):
+        """Mark the workspace of window `con_id` dirty."""
+        window = self.windows.get(con_id)
+        if window is not None:
+            self.dirty.add(window.workspace.id)
+
+    def renamed(self, workspace, name):
+        workspace.name = name
+
+    def apply(self, event):
+        """Update the model from `event`, or invalidate it if that is not possible."""
+        change = getattr(event, "change", None)
+        if getattr(event, "current", None) is not None:
+            self._apply_workspace_event(change, event.current)
+        elif change == "close":
+            window = self.windows.pop(event.container.id, None)
+            # windows outside named workspaces, e.g. the scratchpad, are not modelled
+            if window is not None:
+                window.workspace.windows.remove(window)
+                self.dirty.add(window.workspace.id)
+        elif change == "title":
+            window = self.windows.get(event.container.id)
+            if window is not None:
+                window.update(event.container)
+        else:
+            # new, move or no event at all: the workspace of the window is unknown
+            self.invalidate()
+
+    def _apply_workspace_event(self, change, con):
+        if change == "init":
+            if con.id not in self.workspaces:
+                self.workspaces[con.id] = WorkspaceRecord(con)
+            self.dirty.add(con.id)
+        elif change == "empty":
+            self.workspaces.pop(con.id, None)
+            self.dirty.discard(con.id)
+        elif change == "rename":
+            workspace = self.workspaces.get(con.id)
+            if workspace is not None:
+                workspace.num = con.num
+                workspace.name = con.name
+                self.dirty.add(con.id)
+        else:
+            self.invalidate()
+
+
+class TreeWindow:
+    """A leaf of a `parse_tree` tree: the container id and the window identifiers."""
+
+    __slots__ = ("id",) + WINDOW_IDENTIFIERS
+
+    def __init__(self, con):
+        self.id = con["id"]
+        self.name = con.get("name")
+        properties = con.get("window_properties") or {}
+        self.window_title = properties.get("title")
+        self.window_instance = properties.get("instance")
+        self.window_class = properties.get("class")
+        self.app_id = con.get("app_id")
+
+
+class TreeNode:
+    """Any other container of a `parse_tree` tree.
+
+    `nodes` holds the tiling children followed by the floating ones, which
+    is the order ``i3ipc.Con`` visits them in.
+    """
+
+    __slots__ = ("id", "type", "num", "name", "nodes")
+
+    def __init__(self, con, nodes):
+        self.id = con["id"]
+        self.type = con.get("type")
+        self.num = con.get("num")
+        self.name = con.get("name")
+        self.nodes = nodes
+
+    def leaves(self):
+        """Windows below this container, breadth first like ``i3ipc.Con.leaves``."""
+        leaves = []
+        # the windows of a dockarea (bars) are not leaves
+        queue = deque(self.nodes if self.type != "dockarea" else ())
+        while queue:
+            con = queue.popleft()
+            if type(con) is TreeWindow:
+                leaves.append(con)
+            elif con.type != "dockarea":
+                queue.extend(con.nodes)
+        return leaves
+
+    def workspaces(self):
+        """Workspaces below this container, without the internal ``__i3_scratch``."""
+        workspaces = []
+        stack = [self]
+        while stack:
+            con = stack.pop()
+            # windows outside of workspaces, e.g. the bar in a dockarea
+            if type(con) is not TreeNode:
+                continue
+            if con.type == "workspace":
+                if not con.name.startswith("__"):
+                    workspaces.append(con)
+            else:
+                stack.extend(reversed(con.nodes))
+        return workspaces
+
+
+def _tree_object(obj):
+    # called by the json decoder for every object, children before their parent
+    nodes = obj.get("nodes")
+    if nodes is None:
+        # rects, gaps, swallows, ...: only the window properties are of use
+        return obj if "class" in obj or "title" in obj else None
+    floating = obj.get("floating_nodes")
+    if floating:
+        nodes = nodes + floating
+    if not nodes and obj.get("type") == "con":
+        return TreeWindow(obj)
+    return TreeNode(obj, nodes)
+
+
+def parse_tree(data):
+    """Decode a GET_TREE reply into the few fields the rename pass needs.
+
+    Every container is reduced to a `TreeNode` or `TreeWindow` as soon as it
+    is decoded, so the geometry, gaps, marks and other attributes are
+    dropped right away instead of being kept for the whole tree like
+    ``i3ipc.Con`` does. The result offers the ``workspaces()`` and
+    ``leaves()`` of ``i3ipc.Con`` used by the daemon.
+
+    Parameters
+    ----------
+    data: `str|bytes`
+        The JSON reply of i3.
 
     Returns
     -------
-    func
-        The rename callback.
+    TreeNode
+        The root container.
     """
-    form = args.number_separator_format
-    delim = args.delimiter
-    length = args.max_title_length
-    uniq = args.uniq
-    ignore_unknown = args.ignore_unknown
-    no_unknown_name = args.no_match_not_show_name
-    verbose = args.verbose
+    return json.loads(data, object_hook=_tree_object)
+
+
+def _raw_tree_request(i3):
+    """Return a function returning the raw GET_TREE reply of the i3ipc connection `i3`.
+
+    i3ipc only returns the raw reply from its private request method. None
+    if this version of i3ipc does not have it, the tree then has to be read
+    with ``get_tree``.
+    """
+    try:
+        from i3ipc._private import MessageType
 
-    def get_icon(icon_name):
-        # is pango markup?
-        if icon_name.startswith("<"):
-            return icon_name
-        if icon_name in fa_icons:
-            return fa_icons[icon_name]
+        request = i3._message
+        message_type = MessageType.GET_TREE
+    except (ImportError, AttributeError):
         return None
+    return lambda: request(message_type, "")
+
+
+def _read_tree(i3):
+    request = _raw_tree_request(i3)
+    if request is None:
+        return i3.get_tree()
+    return parse_tree(request())
+
+
+# i3 IPC message and event types, see https://i3wm.org/docs/ipc.html
+IPC_RUN_COMMAND = 0
+IPC_SUBSCRIBE = 2
+IPC_GET_TREE = 4
+IPC_SEND_TICK = 10
+IPC_EVENTS = (
+    "workspace", "output", "mode", "window", "barconfig_update", "binding", "shutdown", "tick",
+)
+_IPC_MAGIC = b"i3-ipc"
+_IPC_HEADER = struct.Struct("=6sII")
+_IPC_EVENT_BIT = 1 << 31
+
+
+def _ipc_socket_path():
+    for variable in ("I3SOCK", "SWAYSOCK"):
+        if path := os.environ.get(variable):
+            return path
+    # only needed without the environment of the window manager
+    import subprocess
+
+    for wm in ("i3", "sway"):
+        try:
+            path = subprocess.run(
+                [wm, "--get-socketpath"], capture_output=True, text=True
+            ).stdout.strip()
+        except OSError:
+            continue
+        if path:
+            return path
+    raise ConnectionError("Could not find the IPC socket of i3 or sway")
+
+
+def _ipc_message(message_type, payload=""):
+    data = payload.encode()
+    return _IPC_HEADER.pack(_IPC_MAGIC, len(data), message_type) + data
+
+
+class _IPCReader:
+    """Reads messages from an IPC socket into one buffer that is reused for all of them."""
+
+    def __init__(self, sock, size=4096):
+        self.sock = sock
+        self.buffer = bytearray(size)
+
+    def _fill(self, size):
+        if size > len(self.buffer):
+            self.buffer = bytearray(max(size, 2 * len(self.buffer)))
+        view = memoryview(self.buffer)
+        received = 0
+        while received < size:
+            count = self.sock.recv_into(view[received:size])
+            if not count:
+                raise ConnectionError("The IPC connection was closed")
+            received += count
+        return view
+
+    def read(self):
+        """Return the type and the decoded payload of the next message."""
+        magic, length, message_type = _IPC_HEADER.unpack_from(self._fill(_IPC_HEADER.size))
+        if magic != _IPC_MAGIC:
+            raise ConnectionError("Not an i3 IPC message: {!r}".format(magic))
+        return message_type, str(self._fill(length)[:length], "utf-8", "replace")
+
+
+class IPCEvent:
+    """An event of `IPCConnection`, with the fields of its payload as attributes."""
+
+    def __init__(self, fields, payload=None):
+        self.__dict__.update(fields)
+        self._payload = payload
+
+    @property
+    def ipc_data(self):
+        """The payload decoded as plain JSON, like ``ipc_data`` of the i3ipc events."""
+        return json.loads(self._payload)
+
+
+def _event_object(obj):
+    # containers become TreeNode/TreeWindow, like in `parse_tree`
+    return obj if "nodes" not in obj else _tree_object(obj)
+
+
+class IPCConnection:
+    """Minimal client of the i3/sway IPC protocol, a replacement for ``i3ipc.Connection``.
+
+    Implements the requests the daemon uses: ``command``, ``get_tree``
+    (returning the compact tree of `parse_tree`), ``send_tick`` and event
+    subscriptions with ``on`` and ``main``. Requests and events use separate
+    sockets, so a command never waits behind queued events, and the command
+    socket stays open for the lifetime of the connection. Requests can be
+    pipelined: `pipeline` sends several at once and then reads all replies.
+
+    Parameters
+    ----------
+    socket_path: `str|None`
+        Path of the IPC socket, found like i3ipc does if None.
+    """
+
+    def __init__(self, socket_path=None):
+        self.socket_path = socket_path or _ipc_socket_path()
+        self._cmd = self._connect()
+        self._cmd_reader = _IPCReader(self._cmd, 1 << 16)
+        # the rename may be run from the timer thread of the scheduler
+        self._cmd_lock = threading.Lock()
+        self._sub = None
+        self._handlers = {}
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)
+        return sock
+
+    def pipeline(self, *requests):
+        """Send all `requests`, pairs of message type and payload, and return their replies.
+
+        The replies are the raw JSON strings, in the order of `requests`.
+        """
+        with self._cmd_lock:
+            self._cmd.sendall(b"".join(_ipc_message(*request) for request in requests))
+            replies = []
+            for message_type, _ in requests:
+                reply_type, payload = self._cmd_reader.read()
+                if reply_type != message_type:
+                    raise ConnectionError(
+                        "Expected a reply of type {}, got {}".format(message_type, reply_type)
+                    )
+                replies.append(payload)
+            return replies
+
+    def command(self, payload):
+        """Run the i3 commands `payload`, return the list of their results."""
+        return json.loads(self.pipeline((IPC_RUN_COMMAND, payload))[0])
+
+    def get_tree(self):
+        """Return the layout tree as decoded by `parse_tree`."""
+        return parse_tree(self.pipeline((IPC_GET_TREE, ""))[0])
+
+    def send_tick(self, payload=""):
+        """Send a tick event with `payload` to all subscribers, return whether i3 accepted it."""
+        return json.loads(self.pipeline((IPC_SEND_TICK, payload))[0]).get("success", False)
+
+    def on(self, event, handler):
+        """Call ``handler(connection, event)`` on `event`, e.g. ``"window"`` or ``"window::new"``."""
+        self._handlers.setdefault(event, []).append(handler)
+
+    def main(self):
+        """Subscribe to the events of all handlers and dispatch them until `main_quit`.
+
+        Also returns when i3 shuts down or the connection is lost.
+        """
+        self._sub = self._connect()
+        reader = _IPCReader(self._sub)
+        # shutdown always ends the loop
+        names = sorted({event.split("::")[0] for event in self._handlers} | {"shutdown"})
+        self._sub.sendall(_ipc_message(IPC_SUBSCRIBE, json.dumps(names)))
+        try:
+            _, reply = reader.read()
+            if not json.loads(reply).get("success"):
+                raise ConnectionError("Could not subscribe to {}".format(names))
+            self._dispatch(reader)
+        finally:
+            self._sub.close()
+            self._sub = None
+
+    def _dispatch(self, reader):
+        while True:
+            try:
+                message_type, payload = reader.read()
+            except OSError:
+                # i3 exited or restarted, or main_quit closed the socket
+                return
+            index = message_type & ~_IPC_EVENT_BIT
+            if not message_type & _IPC_EVENT_BIT or index >= len(IPC_EVENTS):
+                continue
+            name = IPC_EVENTS[index]
+            event = IPCEvent(json.loads(payload, object_hook=_event_object), payload)
+            change = getattr(event, "change", None)
+            for handler in self._handlers.get(name, []) + self._handlers.get(
+                "{}::{}".format(name, change), []
+            ):
+                handler(self, event)
+            if name == "shutdown":
+                return
+
+    def main_quit(self):
+        """Make `main` return, also from another thread."""
+        if self._sub is not None:
+            self._sub.shutdown(socket.SHUT_RDWR)
+
+    def close(self):
+        self.main_quit()
+        self._cmd.close()
+
+
+def _open_trace(path, mode):
+    # traces are text, compressed when the name says so
+    if path.endswith(".gz"):
+        import gzip
+
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class TraceWriter:
+    """Writer of the trace file of ``--record``.
+
+    Every line is a record of three tab separated fields: the seconds since
+    the start of the recording, the kind of record and its JSON payload. The
+    kind is ``tree`` for a ``get_tree`` reply and the event type otherwise,
+    e.g. ``window::title``. The file is compressed with gzip if its name ends
+    with ``.gz``, and flushed at least every `flush_interval` seconds.
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.records = 0
+        self._file = _open_trace(path, "w")
+        self._lock = threading.Lock()
+        self._start = self._flushed = time.monotonic()
+
+    def write(self, kind, payload):
+        """Append a record, `payload` being a JSON string."""
+        with self._lock:
+            now = time.monotonic()
+            self._file.write("{:.6f}\t{}\t{}\n".format(now - self._start, kind, payload))
+            self.records += 1
+            if now - self._flushed > self.flush_interval:
+                self._file.flush()
+                self._flushed = now
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_trace(path):
+    """Yield the records of a trace written by `TraceWriter` as (seconds, kind, payload)."""
+    with _open_trace(path, "r") as f:
+        for line in f:
+            seconds, kind, payload = line.rstrip("\n").split("\t", 2)
+            yield float(seconds), kind, payload
+
+
+class RecordingConnection:
+    """Wrapper of an i3 connection writing the events and trees it sees to a `TraceWriter`.
+
+    Handlers registered with `on` are called with the wrapper as connection,
+    so the trees the rename reads go through it as well. Everything else is
+    passed on to the wrapped connection.
+    """
+
+    def __init__(self, i3, trace):
+        self._i3 = i3
+        self.trace = trace
+
+    def __getattr__(self, name):
+        return getattr(self._i3, name)
+
+    def on(self, event, handler):
+        def record(i3, event, *rest):
+            self.trace.write(_event_type(event), json.dumps(event.ipc_data, separators=(",", ":")))
+            handler(self, event, *rest)
+
+        self._i3.on(event, record)
+
+    def _tree_data(self):
+        if isinstance(self._i3, IPCConnection):
+            data = self._i3.pipeline((IPC_GET_TREE, ""))[0]
+        else:
+            request = _raw_tree_request(self._i3)
+            if request is not None:
+                data = request()
+            else:
+                data = json.dumps(self._i3.get_tree().ipc_data)
+        self.trace.write("tree", data)
+        return data
+
+    def _message(self, message_type, payload=""):
+        # i3ipc passes its MessageType enum
+        if getattr(message_type, "value", message_type) == IPC_GET_TREE:
+            return self._tree_data()
+        return self._i3._message(message_type, payload)
+
+    def get_tree(self):
+        data = self._tree_data()
+        if isinstance(self._i3, IPCConnection):
+            return parse_tree(data)
+        return i3ipc.Con(json.loads(data), None, self._i3)
+
+
+class TraceConnection:
+    """Stand-in for the i3 connection replaying a trace of ``--record``.
+
+    `main` dispatches the recorded events to the handlers registered with
+    `on`, as fast as possible or, with `realtime`, with their recorded
+    timing. ``get_tree`` answers with the tree recorded after the event being
+    replayed, or the last one before it, so a replay sees the windows the
+    recording daemon saw. Commands are collected in `commands` and succeed,
+    `events` counts the replayed events and `elapsed` is the duration of
+    `main` in seconds.
+
+    Parameters
+    ----------
+    path: `str`
+        The trace file.
+    realtime: `bool`
+        Whether to wait between the events like the recording did.
+    lean: `bool`
+        Whether trees and events are decoded like `IPCConnection` does
+        (`parse_tree` records) instead of as i3ipc objects.
+    """
+
+    _I3IPC_EVENTS = {"window": i3ipc.WindowEvent, "workspace": i3ipc.WorkspaceEvent}
+
+    def __init__(self, path, realtime=False, lean=False):
+        self.realtime = realtime
+        self.lean = lean
+        self.commands = []
+        self.events = 0
+        self.elapsed = 0.0
+        self._handlers = {}
+        self._tree = None
+        self._quit = False
+        # [seconds, event type, payload, tree]
+        self._steps = []
+        for seconds, kind, payload in read_trace(path):
+            if kind == "tree":
+                # the tree read after an event shows its effect
+                if self._steps:
+                    self._steps[-1][3] = payload
+                else:
+                    self._tree = payload
+            else:
+                tree = self._steps[-1][3] if self._steps else self._tree
+                self._steps.append([seconds, kind, payload, tree])
+        if self._tree is None:
+            raise ValueError("The trace {} starts without a tree".format(path))
+
+    def on(self, event, handler):
+        self._handlers.setdefault(event, []).append(handler)
+
+    def get_tree(self):
+        if self.lean:
+            return parse_tree(self._tree)
+        return i3ipc.Con(json.loads(self._tree), None, self)
+
+    def _message(self, message_type, payload=""):
+        # only GET_TREE is used, by `_read_tree`
+        return self._tree
+
+    def command(self, payload):
+        self.commands.append(payload)
+        return [{"success": True} for _ in payload.split(";")]
+
+    def _event(self, name, payload):
+        if self.lean:
+            return IPCEvent(json.loads(payload, object_hook=_event_object), payload)
+        return self._I3IPC_EVENTS[name](json.loads(payload), self)
+
+    def main(self):
+        start = time.monotonic()
+        try:
+            self._replay(start)
+        finally:
+            self.elapsed = time.monotonic() - start
+
+    def _replay(self, start):
+        for seconds, kind, payload, tree in self._steps:
+            name = kind.split("::")[0]
+            handlers = self._handlers.get(name, []) + self._handlers.get(kind, [])
+            if not handlers:
+                continue
+            if self.realtime:
+                time.sleep(max(0.0, start + seconds - time.monotonic()))
+            self._tree = tree
+            event = self._event(name, payload)
+            self.events += 1
+            for handler in handlers:
+                handler(self, event)
+            if self._quit:
+                return
+
+    def main_quit(self):
+        self._quit = True
+
+
+class Histogram:
+    """Durations counted in power-of-two buckets of microseconds."""
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets = [0] * 32
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.buckets[min(int(seconds * 1e6).bit_length(), 31)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Upper bound in microseconds of the bucket holding the `p`th percentile."""
+        rank = self.count * p / 100
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return 1 << bucket
+        return 0
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean_us": round(self.total / self.count * 1e6, 1) if self.count else 0,
+            "max_us": round(self.max * 1e6, 1),
+            "p50_us": self.percentile(50),
+            "p90_us": self.percentile(90),
+            "p99_us": self.percentile(99),
+        }
+
+
+def _event_type(event):
+    if event is None:
+        return "startup"
+    if getattr(event, "current", None) is not None:
+        return "workspace::{}".format(event.change)
+    return "window::{}".format(getattr(event, "change", None))
+
+
+class Stats:
+    """Counters and latency histograms of the rename loop.
+
+    Parameters
+    ----------
+    path: `str|None`
+        File the statistics are written to as JSON, at most every `interval`
+        seconds after a rename pass. Without a path they are written to stderr
+        by `dump` only.
+    interval: `float`
+        Minimum time between two periodic writes in seconds.
+
+    Notes
+    -----
+    The counters are updated from the event loop, the scheduler's timer and
+    the thread of `WriteBehind`, so they are only changed and read through
+    the methods, which hold a lock.
+    """
+
+    def __init__(self, path=None, interval=10.0):
+        self.path = path
+        self.interval = interval
+        self.started = time.time()
+        self.events = {}
+        self.skipped = {}
+        self.passes = 0
+        self.renames = 0
+        self.unchanged = 0
+        # from receiving the event to the end of the rename pass
+        self.latency = Histogram()
+        self.get_tree = Histogram()
+        self.labels = Histogram()
+        self.command = Histogram()
+        # name: object with an `as_dict` method, e.g. `LabelCache`
+        self.caches = {}
+        # `RuleProfile` of the rules in use with --profile-rules
+        self.profile = None
+        self._written = time.monotonic()
+        # reentrant, `dump` may be a signal handler interrupting an update
+        self._lock = threading.RLock()
+
+    def add(self, histogram, seconds):
+        """Add `seconds` to `histogram`, one of the `Histogram` attributes."""
+        with self._lock:
+            histogram.add(seconds)
+
+    def count_event(self, event, needed):
+        event_type = _event_type(event)
+        with self._lock:
+            self.events[event_type] = self.events.get(event_type, 0) + 1
+            if not needed:
+                self.skipped[event_type] = self.skipped.get(event_type, 0) + 1
+
+    def count_workspaces(self, workspaces, renames):
+        with self._lock:
+            self.renames += renames
+            self.unchanged += workspaces - renames
+
+    def count_pass(self, received=None):
+        with self._lock:
+            self.passes += 1
+            if received is not None:
+                self.latency.add(time.perf_counter() - received)
+            if self.path is not None and time.monotonic() - self._written > self.interval:
+                try:
+                    self.dump()
+                except OSError as e:
+                    # the statistics must not stop the renames
+                    print("Could not write the statistics: {}".format(e), file=stderr)
+
+    def as_dict(self):
+        with self._lock:
+            return self._as_dict()
+
+    def _as_dict(self):
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "events": dict(self.events),
+            "events_skipped": dict(self.skipped),
+            "passes": self.passes,
+            "renames": self.renames,
+            "workspaces_unchanged": self.unchanged,
+            "event_latency": self.latency.as_dict(),
+            "get_tree": self.get_tree.as_dict(),
+            "labels": self.labels.as_dict(),
+            "command": self.command.as_dict(),
+            "caches": {name: cache.as_dict() for name, cache in self.caches.items()},
+            "rules": self.profile.as_dict() if self.profile is not None else None,
+        }
+
+    def dump(self, *_):
+        """Write the statistics to `path`, or stderr without one.
+
+        Accepts and ignores the arguments of a signal handler.
+        """
+        with self._lock:
+            self._written = time.monotonic()
+            data = json.dumps(self._as_dict(), indent=2)
+            if self.path is None:
+                print(data, file=stderr)
+                return
+            # readers never see a half written file
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(data + "\n")
+            os.replace(tmp_path, self.path)
+
+
+class RenameScheduler:
+    """Coalesce bursts of events into as few rename passes as possible.
+
+    A structural event (a window opened, closed or moved, a workspace created)
+    arriving while the scheduler is idle runs the pass right away (leading
+    edge) and opens a window of `debounce` seconds. Events inside the window
+    only mark a pass as pending, which runs once when the window expires
+    (trailing edge) and opens the next window. Title changes never take the
+    leading edge, they always wait for the trailing one; a structural event
+    arriving while only title changes are pending runs at once instead of
+    waiting behind them.
+
+    Parameters
+    ----------
+    run: `func`
+        The rename pass, called with the arguments of the latest event.
+    debounce: `float`
+        Length of the coalescing window in seconds.
+    lock: `threading.RLock`
+        Held while the pass runs, as the trailing edge runs on a timer thread.
+    timer: `func`
+        Factory with the signature of `threading.Timer`.
+    """
+
+    def __init__(self, run, debounce, lock, timer=threading.Timer):
+        self._run = run
+        self._debounce = debounce
+        self._lock = lock
+        self._timer_factory = timer
+        self._timer = None
+        # a cancelled timer may already be waiting for the lock, stale
+        # generations are ignored when they expire
+        self._generation = 0
+        self._pending = None
+        # whether the current window was opened by a pass (or only by titles)
+        self._ran = False
+        self.submitted = 0
+        self.runs = 0
+
+    def _start_timer(self):
+        self._generation += 1
+        self._timer = self._timer_factory(self._debounce, self._expire, args=(self._generation,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def submit(self, *args, structural=True):
+        with self._lock:
+            self.submitted += 1
+            if structural and not self._ran:
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._pending = None
+                self._ran = True
+                self._start_timer()
+                self._call(args)
+                return
+            self._pending = args
+            if self._timer is None:
+                self._start_timer()
+
+    def _expire(self, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            if self._pending is None:
+                self._timer = None
+                self._ran = False
+                return
+            args, self._pending = self._pending, None
+            self._ran = True
+            self._start_timer()
+            self._call(args)
+
+    def flush(self):
+        """Run the pending pass now instead of at the end of the window."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._generation += 1
+            self._ran = False
+            if self._pending is not None:
+                args, self._pending = self._pending, None
+                self._call(args)
+
+    def _call(self, args):
+        self.runs += 1
+        self._run(*args)
+
+
+def _rename_command(old, new):
+    return 'rename workspace "{}" to "{}"'.format(
+        # escape any double quotes in old or new name.
+        old.replace('"', '\\"'),
+        new.replace('"', '\\"'),
+    )
+
+
+class WriteBehind:
+    """Sends rename batches from a background thread, merging those that have to wait.
+
+    While a batch is being sent, the renames submitted meanwhile are merged
+    per workspace: only the latest target name is kept, renamed from the name
+    the workspace will have once the batch in flight is applied, and a
+    workspace renamed back to that name is dropped altogether. When the
+    batch in flight is done, everything merged goes out as the next batch.
+    Renames are planned from `expected_names`, since a tree read meanwhile
+    may not show the names being sent yet.
+
+    Parameters
+    ----------
+    send: `callable`
+        Called as ``send(renames, *args)`` on the background thread, with a
+        list of (workspace id, old name, new name) and the `args` of the
+        first `submit` merged into the batch.
+
+    Attributes
+    ----------
+    batches: `int`
+        Batches sent.
+    merged: `int`
+        Renames that never were sent because a newer one replaced them.
+    """
 
-    def transform_title(target_mapping, window_title):
-        tt = target_mapping["transform_title"]
-        transform_from = "^" + tt["from"] + "$"
-        transform_to = tt["to"]
-        result, nr_subs = re.subn(transform_from, transform_to, window_title)
-
-        # shorten name
-        if tt.get("compress", False):
-            result = compress(result)
-        result = truncate(result, length)
-
-        # try to get the icon, otherwise leave blank string
-        icon = ""
-        if target_mapping.get("icon", None):
-            i = get_icon(target_mapping["icon"])
-            if i:
-                icon = i
-
-        # did the title regex match?
-        if nr_subs > 0:
-            return "{}{}".format(icon, result)
-
-        # fallback: title did not match, but icon defined
-        if icon:
-            return icon
-
-    def resolve_icon_or_mapping(name, leaf):
-        for name_re in mappings.keys():
-            if re.match(name_re, name, re.IGNORECASE):
-                # the key of the json configuration matches, we can
-                # apply the mapping now
-                target_mapping = mappings[name_re]
-
-                if type(target_mapping) == str:
-                    return get_icon(target_mapping)
-
-                # is mapped to a title transformation?
-                if type(target_mapping) == dict:
-                    # it could be a dict, have the icon but not transform_title
-                    if target_mapping.get("transform_title"):
-                        window_title = getattr(
-                            leaf,
-                            target_mapping['transform_title'].get('on', "window_title"),
-                            ""
-                        )
-                        return transform_title(target_mapping, window_title)
-                    return get_icon(target_mapping.get('icon', ''))
-
-    def get_app_label(leaf, length):
+    def __init__(self, send):
+        self._send = send
+        self._pending = {}
+        # workspace id: new name of the batch in flight
+        self._sending = {}
+        self._args = ()
+        self._busy = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self.batches = 0
+        self.merged = 0
+
+    def submit(self, renames, *args):
+        with self._cond:
+            if not self._pending:
+                self._args = args
+            for ws_id, old, new in renames:
+                entry = self._pending.get(ws_id)
+                if entry is None:
+                    self._pending[ws_id] = (old, new)
+                    continue
+                self.merged += 1
+                if entry[0] == new:
+                    # back to the name it has in i3
+                    self.merged += 1
+                    del self._pending[ws_id]
+                else:
+                    self._pending[ws_id] = (entry[0], new)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def expected_names(self):
+        """Return the names the workspaces will have once everything submitted is sent.
+
+        Returns
+        -------
+        dict[int, str]
+            The latest name of every workspace with a rename in flight or
+            pending, by workspace id.
+        """
+        with self._cond:
+            names = dict(self._sending)
+            names.update((ws_id, new) for ws_id, (_, new) in self._pending.items())
+            return names
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._busy = False
+                self._sending = {}
+                self._cond.notify_all()
+                while not self._pending:
+                    self._cond.wait()
+                renames = [(ws_id, old, new) for ws_id, (old, new) in self._pending.items()]
+                args = self._args
+                self._sending = {ws_id: new for ws_id, _, new in renames}
+                self._pending = {}
+                self._busy = True
+                self.batches += 1
+            self._send(renames, *args)
+
+    def flush(self, timeout=None):
+        """Wait until all submitted renames were sent, return False on a timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._busy and not self._pending, timeout)
+
+
+def _transform_title(rule, window_title, length):
+    result, nr_subs = rule.transform.subn(rule.transform_to, window_title)
+
+    # shorten name
+    if rule.compress:
+        result = compress(result)
+    result = truncate(result, length)
+
+    # did the title regex match?
+    if nr_subs > 0:
+        return "{}{}".format(rule.icon or "", result)
+
+    # fallback: title did not match, but icon defined
+    if rule.icon:
+        return rule.icon
+
+
+class Labeller:
+    """Labels single windows with the rules of an app-icon config.
+
+    The label of a window is the icon or transformed title of the first rule
+    matching one of its `WINDOW_IDENTIFIERS`, in that order, or its class when
+    no rule matches.
+
+    Parameters
+    ----------
+    mappings: `dict[str, Union[dict, str]]`
+        Index of application-name regex to icon-name, see `build_rename`.
+    args:
+        The options of `build_rename`, only the labelling ones are used.
+    icons: `dict[str, str]|None`
+        Glyphs of the icons referenced by `mappings`, looked up with
+        `load_fa_icons` if None.
+    rules: `RuleSet|None`
+        The compiled `mappings`, compiled here if None.
+    title_memo: `LRUMemo|None`
+        Memo of the title transformations to use, a new one if None.
+
+    Attributes
+    ----------
+    rules: `RuleSet`
+        The rules, counting into their `RuleProfile` with `args.profile_rules`.
+    title_memo: `LRUMemo`
+        Results of `transform_title`.
+    matched: `tuple[int]`
+        Positions in `WINDOW_IDENTIFIERS` of the identifiers some rule is
+        matched against.
+    """
+
+    def __init__(self, mappings, args, icons=None, rules=None, title_memo=None):
+        if icons is None:
+            icons = load_fa_icons(_referenced_icons(mappings))
+        self.rules = RuleSet(mappings, icons) if rules is None else rules
+        if getattr(args, "profile_rules", False):
+            self.rules.enable_profile()
+        no_match = mappings.get("_no_match")
+        self._no_match_icon = icons.get(no_match) if isinstance(no_match, str) else None
+        self._length = args.max_title_length
+        self._ignore_unknown = args.ignore_unknown
+        self._no_unknown_name = args.no_match_not_show_name
+        # titles change far less often than passes run, and windows often go back to
+        # an earlier title (e.g. switching buffers in an editor)
+        self.title_memo = (
+            LRUMemo(_transform_title, getattr(args, "title_cache_size", 1024))
+            if title_memo is None else title_memo
+        )
+        # identifiers some rule is matched against, any other one only matters for
+        # the label when it is the first one with a match or is shown unmatched
+        self.matched = tuple(
+            position for position, identifier in enumerate(WINDOW_IDENTIFIERS)
+            if self.rules.applies_to(identifier)
+        )
+
+    def transform_title(self, rule, window_title):
+        return self.title_memo(rule, window_title, self._length)
+
+    def label(self, window):
+        """Return the label of `window` and the identifiers it depends on, see `LabelCache`."""
+        label, depends, _ = self.resolve(window)
+        return label, depends
+
+    def classify(self, window):
+        """Return the label of `window` and the `Rule` it comes from, None without a match."""
+        label, _, rule = self.resolve(window)
+        return label, rule
+
+    def resolve(self, window):
+        """Return the label of `window`, the identifiers it depends on and its `Rule`."""
+        rules = self.rules
+        matched = self.matched
         # interate through all identifiers, stop when first match is found
-        for identifier in ("name", "window_title", "window_instance", "window_class", "app_id"):
-            name = getattr(leaf, identifier, None)
+        for position, identifier in enumerate(WINDOW_IDENTIFIERS):
+            name = getattr(window, identifier, None)
             if name is None:
                 continue
-            mapping = resolve_icon_or_mapping(name, leaf)
+            index = rules.match(name, identifier)
+            if index is None:
+                continue
+            # the key of the json configuration matches, we can
+            # apply the mapping now
+            rule = rules.rules[index]
+            # is mapped to a title transformation?
+            if rule.transform is not None:
+                mapping = self.transform_title(rule, getattr(window, rule.transform_on, ""))
+            else:
+                mapping = rule.icon
             if mapping:
-                return mapping
+                # a change of an earlier identifier could make another rule match
+                depends = {p for p in matched if p < position}
+                depends.add(position)
+                if rule.transform is not None:
+                    if rule.transform_on not in WINDOW_IDENTIFIERS:
+                        return mapping, None, rule
+                    depends.add(WINDOW_IDENTIFIERS.index(rule.transform_on))
+                return mapping, tuple(depends), rule
 
         # no mapping was found
-        if ignore_unknown:
-            return None
+        if self._ignore_unknown:
+            return None, matched, None
 
-        no_match_fallback = "_no_match" in mappings and mappings["_no_match"] in fa_icons
+        depends = matched + _FALLBACK_POSITIONS
+        no_match_icon = self._no_match_icon
         if (
-            (name := getattr(leaf, 'window_class', False))
-            or (name := getattr(leaf, 'app_id', False))
+            (name := getattr(window, 'window_class', False))
+            or (name := getattr(window, 'app_id', False))
         ):
             # window class exists, no match was found
-            if no_match_fallback:
-                return fa_icons[mappings["_no_match"]] + (
-                    "" if no_unknown_name else truncate(name, length)
-                )
-            return truncate(name, length)
+            if no_match_icon is not None:
+                return no_match_icon + (
+                    "" if self._no_unknown_name else truncate(name, self._length)
+                ), depends, None
+            return truncate(name, self._length), depends, None
         else:
             # no identifiable information about this window
-            if no_match_fallback:
-                return fa_icons[mappings["_no_match"]]
-            return "?"
+            if no_match_icon is not None:
+                return no_match_icon, depends, None
+            return "?", depends, None
+
+
+def build_rename(i3, mappings, fixed_ws, args, icons=None, command_connection=None):
+    """Build rename callback function to pass to i3ipc.
+
+    Parameters
+    ----------
+    i3: `i3ipc.i3ipc.Connection`
+    mappings: `dict[str, Union[dict, str]]`
+        Index of application-name regex (from i3) to icon-name (in font-awesome gallery).
+    fixed_ws: `dict[str, Union[dict, str]]`
+        Workspace mapping with fixed icon/title
+    delim: `str`
+        Delimiter to use when build workspace name from app names/icons.
+    icons: `dict[str, str]|None`
+        Glyphs of the icons referenced by `mappings` and `fixed_ws`, looked up
+        with `load_fa_icons` if None.
+    command_connection: `i3ipc.Connection|IPCConnection|None`
+        Connection the commands are sent on with `args.background_commands`,
+        the one the rename is called with if None.
 
-    def rename_fixed(workspace):
-        newname = form.format(workspace.num,'')
-        wsc = fixed_ws[workspace.num]
+    Returns
+    -------
+    func
+        The rename callback. Its `labeller` attribute is the `Labeller` of
+        single windows with the current config. Its `label_cache`
+        attribute is the `LabelCache` holding the labels of the windows seen so
+        far, its `scheduler` attribute the `RenameScheduler` coalescing events
+        when `args.debounce_ms` is set and its `shadow` attribute the
+        `ShadowTree` used instead of ``get_tree`` when `args.shadow_tree` is set.
+        Its `stats` attribute is the `Stats` of the rename loop when `args.stats`,
+        `args.stats_file` or `args.profile_rules` is set, None otherwise; with
+        `args.profile_rules` the rules also count their attempts, hits and
+        match time, see `RuleSet.enable_profile`. Its `reload` attribute
+        switches to another config, see `reload`. The tree is read with
+        `parse_tree` instead of ``i3.get_tree`` when `args.lean_tree` is set.
+        With `args.background_commands` the commands are sent by the
+        `WriteBehind` in its `dispatcher` attribute, and the pass returns
+        without waiting for i3's reply.
+    """
+    form = args.number_separator_format
+    delim = args.delimiter
+    uniq = args.uniq
+    verbose = args.verbose
+    # everything that only depends on the config is resolved once here, the
+    # callback only runs the prepared patterns
+    if icons is None:
+        icons = load_fa_icons(_referenced_icons(mappings, fixed_ws))
+    fa_icons = icons
+    labeller = Labeller(mappings, args, fa_icons)
+
+    def fixed_name(num, wsc):
+        newname = form.format(num, '')
         if isinstance(wsc, str):
-            newname += get_icon(wsc)
+            newname += _glyph(wsc, fa_icons) or ''
         else:
-            if icon_name := fixed_ws[workspace.num].get('icon'):
-                newname += get_icon(icon_name) + ' '
-            if wsname := fixed_ws[workspace.num].get('name'):
+            if icon_name := wsc.get('icon'):
+                newname += (_glyph(icon_name, fa_icons) or '') + ' '
+            if wsname := wsc.get('name'):
                 newname += wsname
         return newname
 
-    def rename(i3, *_):
-        workspaces = i3.get_tree().workspaces()
+    fixed_names = {num: fixed_name(num, wsc) for num, wsc in fixed_ws.items()}
+
+    label_cache = LabelCache(lambda leaf: labeller.label(leaf))
+    shadow = ShadowTree() if getattr(args, "shadow_tree", False) else None
+    stats_file = getattr(args, "stats_file", None)
+    stats = (
+        Stats(stats_file)
+        if stats_file or getattr(args, "stats", False) or getattr(args, "profile_rules", False)
+        else None
+    )
+    if stats is not None:
+        stats.caches["labels"] = label_cache
+        stats.caches["title_transforms"] = labeller.title_memo
+        stats.profile = labeller.rules.profile
+    get_tree = _read_tree if getattr(args, "lean_tree", False) else lambda i3: i3.get_tree()
+    # with a debounce the pass may run on the scheduler's timer thread
+    lock = threading.RLock()
+
+    def handle_event(event):
+        """Update the label cache for `event`, return whether a rename pass is needed."""
+        needed = _handle_event(event)
+        if stats is not None:
+            stats.count_event(event, needed)
+        return needed
+
+    def _handle_event(event):
+        change = getattr(event, "change", None)
+        workspace_event = getattr(event, "current", None) is not None
+        with lock:
+            if shadow is not None:
+                shadow.apply(event)
+                if workspace_event and change != "init":
+                    # only tracked to keep the model up to date
+                    return False
+            if workspace_event:
+                return True
+            if change == "close":
+                label_cache.evict(event.container.id)
+            elif change == "title":
+                # a title change rarely changes the label (most windows match by class
+                # with a static icon), in that case the workspace names are unchanged
+                # and neither the tree nor a command is needed.
+                if label_cache.unaffected(event.container):
+                    return False
+                previous = label_cache.peek(event.container.id, _MISSING)
+                if label_cache.refresh(event.container) == previous:
+                    return False
+                if shadow is not None:
+                    shadow.touch(event.container.id)
+        return True
+
+    def rename(i3, event=None, *_):
+        received = time.perf_counter() if stats is not None else None
+        if not handle_event(event):
+            return
+        if scheduler is None:
+            rename_all(i3, received)
+        else:
+            scheduler.submit(i3, received, structural=getattr(event, "change", None) != "title")
+
+    def rename_all(i3, received=None):
+        with lock:
+            start = time.perf_counter() if stats is not None else None
+            # the names of the batches still being sent, which the tree may or
+            # may not show yet; taken first, so it cannot be older than the tree
+            expected = dispatcher.expected_names() if dispatcher is not None else None
+            tree = get_tree(i3) if needs_tree() else None
+            if stats is not None and tree is not None:
+                stats.add(stats.get_tree, time.perf_counter() - start)
+            if dispatcher is None:
+                commands = plan(tree)
+                if commands:
+                    send_commands(i3, commands, received)
+                elif stats is not None:
+                    stats.count_pass(received)
+                return
+            renames = []
+            plan(tree, renames, expected)
+            if renames:
+                dispatcher.submit(renames, command_connection or i3, received)
+            elif stats is not None:
+                stats.count_pass(received)
+
+    def send_commands(i3, commands, received=None):
+        start = time.perf_counter() if stats is not None else None
+        # we have to join all the activate workspaces commands into one or the order
+        # might get scrambled by multiple i3-msg instances running asyncronously
+        # causing the wrong workspace to be activated last, which changes the focus.
+        replies = i3.command(u";".join(commands))
+        # on the dispatcher thread this runs without the lock of the passes, `Stats`
+        # has a lock of its own
+        if stats is not None:
+            stats.add(stats.command, time.perf_counter() - start)
+            stats.count_pass(received)
+        check_replies(commands, replies)
+
+    def dispatch(renames, i3, received):
+        commands = [_rename_command(old, new) for _, old, new in renames]
+        try:
+            send_commands(i3, commands, received)
+        except Exception as e:
+            print("Could not send the rename commands: {}".format(e), file=stderr)
+            command_failed()
+
+    def check_replies(commands, replies):
+        """Log the commands of a batch that i3 rejected, return whether there were any.
+
+        After a failure the next pass renames every workspace again.
+        """
+        errors = _command_errors(commands, replies)
+        for command, error in errors:
+            print("Command failed ({}): {}".format(error, command), file=stderr)
+        if errors:
+            command_failed()
+        return bool(errors)
+
+    def command_failed():
+        # i3 kept the old names, which the shadow tree no longer knows
+        if shadow is not None:
+            shadow.invalidate()
+
+    def needs_tree():
+        """Return whether the next `plan` needs the full tree."""
+        return shadow is None or shadow.stale
+
+    def plan(tree, renames=None, expected=None):
+        """Return the rename commands for the next pass.
+
+        `tree` is the result of ``get_tree``, or None when `needs_tree` said
+        the shadow tree can be used instead. The renames are also appended
+        to the list `renames` as (workspace id, old name, new name), if given.
+        `expected` maps workspace ids to the names to rename from instead of
+        their current ones, see `WriteBehind.expected_names`.
+        """
+        with lock:
+            if shadow is None:
+                return _workspace_commands(tree.workspaces(), renames=renames, expected=expected)
+            if tree is not None:
+                shadow.sync(tree)
+            return _workspace_commands(
+                shadow.take_dirty(), complete=tree is not None, renames=renames, expected=expected
+            )
+
+    def _workspace_commands(workspaces, complete=True, renames=None, expected=None):
+        start = time.perf_counter() if stats is not None else None
         commands = []
+        con_ids = set()
         for workspace in workspaces:
-            if workspace.num in fixed_ws:
-                newname = rename_fixed(workspace)
+            if workspace.num in fixed_names:
+                newname = fixed_names[workspace.num]
             else:
-                names = [get_app_label(leaf, length) for leaf in workspace.leaves()]
+                leaves = workspace.leaves()
+                con_ids.update(getattr(leaf, "id", None) for leaf in leaves)
+                names = [label_cache.get(leaf) for leaf in leaves]
                 if uniq:
                     seen = set()
                     names = [x for x in names if x not in seen and not seen.add(x)]
@@ -199,22 +2130,258 @@ def build_rename(i3, mappings, fixed_ws, args):
                 else:
                     newname = names
 
-            if workspace.name != newname:
-                commands.append(
-                    'rename workspace "{}" to "{}"'.format(
-                        # escape any double quotes in old or new name.
-                        workspace.name.replace('"', '\\"'),
-                        newname.replace('"', '\\"'),
-                    )
-                )
+            oldname = workspace.name if not expected else expected.get(workspace.id, workspace.name)
+            if oldname != newname:
+                commands.append(_rename_command(oldname, newname))
+                if renames is not None:
+                    renames.append((workspace.id, oldname, newname))
                 if verbose:
                     print(commands[-1])
+                if shadow is not None:
+                    shadow.renamed(workspace, newname)
+
+        # windows can disappear without a close event, e.g. on a restart of i3
+        if complete:
+            label_cache.retain(con_ids)
+        if stats is not None:
+            stats.add(stats.labels, time.perf_counter() - start)
+            stats.count_workspaces(len(workspaces), len(commands))
+        return commands
+
+    def reload(new_mappings, new_fixed_ws, new_icons=None):
+        """Switch to another config, the next rename pass uses it.
+
+        Only the rules of changed keys and the joined patterns of the regex
+        keys containing one are compiled again (see `RuleSet`), and only the
+        cached labels of windows that a changed key matches are dropped. The current
+        config stays in place if the new one cannot be compiled.
+
+        Parameters
+        ----------
+        new_mappings, new_fixed_ws, new_icons:
+            Like `mappings`, `fixed_ws` and `icons` of `build_rename`.
+
+        Returns
+        -------
+        int
+            The number of cached labels dropped.
+
+        Raises
+        ------
+        re.error
+            When a key of `new_mappings` is not a valid regex.
+        """
+        nonlocal mappings, fa_icons, labeller, fixed_names
+        if new_icons is None:
+            new_icons = load_fa_icons(_referenced_icons(new_mappings, new_fixed_ws))
+        changed = _changed_keys(mappings, new_mappings)
+        if changed is not None and "_no_match" in changed:
+            # the label of every window without a matching rule changes
+            changed = None
+        unchanged = {} if changed is None else {
+            rule.key: rule for rule in labeller.rules.rules if rule.key not in changed
+        }
+        new_labeller = Labeller(
+            new_mappings,
+            args,
+            new_icons,
+            RuleSet(new_mappings, new_icons, unchanged, labeller.rules.patterns),
+            labeller.title_memo,
+        )
+        if new_labeller.matched != labeller.matched:
+            # the cached labels may depend on identifiers they did not record
+            changed = None
+        stale = None if changed is None else _matching_any(changed)
+        with lock:
+            mappings = new_mappings
+            fa_icons = new_icons
+            labeller = rename.labeller = new_labeller
+            if stats is not None:
+                stats.profile = labeller.rules.profile
+            fixed_names = {num: fixed_name(num, wsc) for num, wsc in new_fixed_ws.items()}
+            # results of replaced rules would only wait for their eviction
+            labeller.title_memo.clear()
+            return label_cache.invalidate(stale)
+
+    debounce_ms = getattr(args, "debounce_ms", 0)
+    scheduler = RenameScheduler(rename_all, debounce_ms / 1000, lock) if debounce_ms > 0 else None
+    dispatcher = WriteBehind(dispatch) if getattr(args, "background_commands", False) else None
+
+    rename.labeller = labeller
+    rename.label_cache = label_cache
+    rename.scheduler = scheduler
+    rename.shadow = shadow
+    rename.stats = stats
+    rename.handle_event = handle_event
+    rename.needs_tree = needs_tree
+    rename.plan = plan
+    rename.reload = reload
+    rename.check_replies = check_replies
+    rename.dispatcher = dispatcher
+    return rename
 
-        # we have to join all the activate workspaces commands into one or the order
-        # might get scrambled by multiple i3-msg instances running asyncronously
-        # causing the wrong workspace to be activated last, which changes the focus.
-        i3.command(u";".join(commands))
 
+class WindowIdentifiers:
+    """A window given by its identifiers, e.g. a row of a corpus, see `label_windows`.
+
+    Parameters
+    ----------
+    identifiers: `dict[str, str]`
+        Values of the `WINDOW_IDENTIFIERS`, missing ones are None.
+    """
+
+    __slots__ = WINDOW_IDENTIFIERS
+
+    def __init__(self, identifiers):
+        for attr in WINDOW_IDENTIFIERS:
+            setattr(self, attr, identifiers.get(attr))
+
+
+def label_windows(windows, mappings, args, icons=None):
+    """Label many windows at once, like the rename does for the windows of a workspace.
+
+    Parameters
+    ----------
+    windows: `Iterable`
+        Objects with the `WINDOW_IDENTIFIERS` as attributes, e.g. containers
+        of i3ipc or `WindowIdentifiers`.
+    mappings, args, icons:
+        See `Labeller`.
+
+    Returns
+    -------
+    generator
+        The label of every window of `windows` and the `Rule` it comes from,
+        None when no rule matched, as pairs.
+    """
+    classify = Labeller(mappings, args, icons).classify
+    for window in windows:
+        yield classify(window)
+
+
+# a rename superseded this many times in a row is allowed to finish, so a
+# steady stream of events cannot starve the workspace names
+_MAX_SUPERSEDED = 3
+
+
+def _command_errors(commands, replies):
+    """Return the (command, error) pairs of the `commands` that failed according to `replies`.
+
+    `replies` is the result of ``command``: a list of ``i3ipc.CommandReply``
+    or, from `IPCConnection`, of dicts.
+    """
+    errors = []
+    for index, reply in enumerate(replies or ()):
+        if isinstance(reply, dict):
+            success, error = reply.get("success"), reply.get("error")
+        else:
+            success, error = getattr(reply, "success", True), getattr(reply, "error", None)
+        if not success:
+            command = commands[index] if len(replies) == len(commands) else u";".join(commands)
+            errors.append((command, error))
+    return errors
+
+
+def build_async_rename(i3, mappings, fixed_ws, args, icons=None):
+    """Build rename callback coroutine to pass to i3ipc.aio.
+
+    The labels and commands are computed by the callback of `build_rename`.
+    Every event that needs a rename starts it in a new task and cancels the
+    one still in flight, as the tree it fetched is already out of date. The
+    IPC requests themselves are never interrupted halfway, their replies
+    would be left on the socket.
+
+    Parameters
+    ----------
+    i3: `i3ipc.aio.Connection`
+    mappings: `dict[str, Union[dict, str]]`
+        Index of application-name regex (from i3) to icon-name (in font-awesome gallery).
+    fixed_ws: `dict[str, Union[dict, str]]`
+        Workspace mapping with fixed icon/title
+    args: `argparse.Namespace`
+        Same options as for `build_rename`, `debounce_ms` delays each rename
+        until that many milliseconds passed without a newer event and
+        `background_commands` is not supported.
+    icons: `dict[str, str]|None`
+        See `build_rename`.
+
+    Returns
+    -------
+    coroutine function
+        The rename callback. Its `reload` attribute switches to another
+        config, see `build_rename`.
+    """
+    import asyncio
+
+    # the debounce is awaited here, and the commands are sent by this task,
+    # the threaded scheduler and dispatcher of `build_rename` would be unused
+    sync_args = argparse.Namespace(**dict(vars(args), debounce_ms=0, background_commands=False))
+    sync_rename = build_rename(i3, mappings, fixed_ws, sync_args, icons)
+    stats = sync_rename.stats
+    lean_tree = getattr(args, "lean_tree", False)
+    debounce = getattr(args, "debounce_ms", 0) / 1000
+    # i3ipc.aio does not serialise requests on its command socket
+    ipc_lock = None
+    task = None
+    superseded = 0
+    rerun = False
+
+    async def locked(request):
+        nonlocal ipc_lock
+        if ipc_lock is None:
+            ipc_lock = asyncio.Lock()
+        async with ipc_lock:
+            return await request
+
+    async def get_tree(i3):
+        request = _raw_tree_request(i3) if lean_tree else None
+        if request is None:
+            return await i3.get_tree()
+        return parse_tree(await request())
+
+    async def rename_all(i3, received=None):
+        nonlocal task, superseded, rerun
+        try:
+            if debounce:
+                await asyncio.sleep(debounce)
+            tree = None
+            if sync_rename.needs_tree():
+                start = time.perf_counter()
+                tree = await asyncio.shield(locked(get_tree(i3)))
+                if stats is not None:
+                    stats.add(stats.get_tree, time.perf_counter() - start)
+            commands = sync_rename.plan(tree)
+            superseded = 0
+            if commands:
+                start = time.perf_counter()
+                # one command for the whole batch, see build_rename
+                replies = await asyncio.shield(locked(i3.command(u";".join(commands))))
+                if stats is not None:
+                    stats.add(stats.command, time.perf_counter() - start)
+                sync_rename.check_replies(commands, replies)
+            if stats is not None:
+                stats.count_pass(received)
+        finally:
+            if rerun:
+                rerun = False
+                task = asyncio.ensure_future(rename_all(i3))
+
+    async def rename(i3, event=None, *_):
+        nonlocal task, superseded, rerun
+        received = time.perf_counter()
+        if not sync_rename.handle_event(event):
+            return
+        if task is not None and not task.done():
+            if superseded >= _MAX_SUPERSEDED:
+                rerun = True
+                return
+            superseded += 1
+            task.cancel()
+        task = asyncio.ensure_future(rename_all(i3, received))
+
+    rename.label_cache = sync_rename.label_cache
+    rename.stats = stats
+    rename.reload = sync_rename.reload
     return rename
 
 
@@ -230,6 +2397,18 @@ def _get_i3_dir():
     )
 
 
+def _get_config_path(config_path=None):
+    # the app-icon config file, or None to use the defaults
+    if config_path:
+        if not os.path.isfile(config_path):
+            raise SystemExit(
+                "Specified app-icon config path '{}' does not exist".format(config_path)
+            )
+    else:
+        config_path = os.path.join(_get_i3_dir(), "app-icons.json")
+    return config_path if os.path.isfile(config_path) else None
+
+
 def _get_mapping(config_path=None):
     """Get app-icon mapping from config file or use defaults.
 
@@ -257,15 +2436,8 @@ def _get_mapping(config_path=None):
     If config_path is None then the locations ~/.i3/app-icons.json and ~/.config/i3/app-icons.json will also be used if available. If they are also not available then `DEFAULT_APP_ICON_CONFIG` will be used.
     """
 
-    if config_path:
-        if not os.path.isfile(config_path):
-            raise SystemExit(
-                "Specified app-icon config path '{}' does not exist".format(config_path)
-            )
-    else:
-        config_path = os.path.join(_get_i3_dir(), "app-icons.json")
-
-    if os.path.isfile(config_path):
+    config_path = _get_config_path(config_path)
+    if config_path is not None:
         with open(config_path) as f:
             mappings = json.load(f)
         # normalise app-names to lower
@@ -275,8 +2447,146 @@ def _get_mapping(config_path=None):
         return dict(DEFAULT_APP_ICON_CONFIG)
 
 
-def _verbose_startup(i3):
-    for w in i3.get_tree().workspaces():
+def _split_fixed_workspaces(mappings):
+    # numeric keys name fixed workspaces instead of applications
+    ws = {int(wsn): wsc for wsn, wsc in mappings.items() if wsn.isdigit()}
+    for wsn in ws.keys():
+        del mappings[str(wsn)]
+    return ws
+
+
+# bump when the content of the cache files changes
+CONFIG_CACHE_FORMAT = 2
+
+
+def _config_cache_path(config_path, config_data):
+    """Path of the compiled config cache for the app-icon config `config_data`.
+
+    The name hashes the config together with the versions of this module and
+    of the icon table (their size and modification time), so any change to
+    one of them leads to a new cache file. It starts with a hash of
+    `config_path`, the caches of different config files are kept apart.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(CONFIG_CACHE_FORMAT).encode())
+    digest.update(config_data)
+    fa_icons_spec = importlib.util.find_spec("fa_icons")
+    for path in (__file__, fa_icons_spec.origin if fa_icons_spec else None):
+        if path is not None:
+            st = os.stat(path)
+            digest.update("{}:{}:{}".format(path, st.st_mtime_ns, st.st_size).encode())
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    path_digest = hashlib.sha256(os.path.abspath(config_path).encode()).hexdigest()[:16]
+    return os.path.join(
+        cache_home,
+        "i3-workspace-names-daemon",
+        "{}-{}.json".format(path_digest, digest.hexdigest()),
+    )
+
+
+def _read_config_cache(cache_path):
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            mappings, ws, icons = json.load(f)
+        # JSON object keys are strings, the fixed workspaces are numbers
+        return mappings, {int(k): v for k, v in ws.items()}, icons
+    except Exception:
+        # missing, unreadable or not a cache written by us: compile again
+        return None
+
+
+def _write_config_cache(cache_path, config):
+    cache_dir = os.path.dirname(cache_path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # the cache of the previous version of this config file is of no more
+        # use, those of other config files (e.g. another seat) are kept; the
+        # ".pickle" files are left by versions before the JSON cache
+        prefix = os.path.basename(cache_path).split("-", 1)[0] + "-"
+        for name in os.listdir(cache_dir):
+            if name.startswith(prefix) and name.endswith((".json", ".pickle")):
+                os.remove(os.path.join(cache_dir, name))
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # e.g. a read-only home, the cache is only an optimisation
+        pass
+
+
+def _load_config(config_path=None, validate=True):
+    """Get the validated app-icon config, from the compiled config cache if possible.
+
+    A config that passed validation is cached under ``$XDG_CACHE_HOME``
+    together with the glyphs of its icons, so the next start with the same
+    config neither parses, validates nor looks up icons again.
+
+    Parameters
+    ----------
+    config_path: `str|None`
+        Path to app-icon config file, see `_get_mapping`.
+    validate: `bool`
+        Whether to run `_validate_config` on a config missing from the cache.
+
+    Returns
+    -------
+    tuple[dict, dict, dict|None] or None
+        The mappings without fixed workspaces, the fixed workspaces and the
+        glyphs of all referenced icons (None if not known), or None when the
+        config has errors.
+    """
+    path = _get_config_path(config_path)
+    if path is None:
+        mappings = _get_mapping(config_path)
+        ws = _split_fixed_workspaces(mappings)
+        if validate and _validate_config(mappings):  # pragma: no cover
+            return None
+        return mappings, ws, None
+
+    with open(path, "rb") as f:
+        data = f.read()
+    cache_path = _config_cache_path(path, data)
+    cached = _read_config_cache(cache_path)
+    if cached is not None:
+        return cached
+
+    # normalise app-names to lower
+    mappings = {k.lower(): v for k, v in json.loads(data).items()}
+    ws = _split_fixed_workspaces(mappings)
+    if validate and _validate_config(mappings):
+        return None
+    config = mappings, ws, load_fa_icons(_referenced_icons(mappings, ws))
+    if validate:
+        _write_config_cache(cache_path, config)
+    return config
+
+
+def _reload_config(rename, args):
+    """Load the app-icon config again and pass it to `rename.reload`.
+
+    Returns whether the config was replaced, on any error the running config
+    is kept.
+    """
+    try:
+        config = _load_config(args.config_path, validate=not args.bypass_validation)
+        if config is None:
+            print("Errors in configuration found, keeping the previous one!", file=stderr)
+            return False
+        dropped = rename.reload(*config)
+    except (Exception, SystemExit) as e:
+        print("Could not reload the configuration, keeping the previous one: {}".format(e),
+              file=stderr)
+        return False
+    if args.verbose:
+        print("configuration reloaded, {} cached labels dropped".format(dropped))
+    return True
+
+
+def _verbose_startup(i3, tree=None):
+    if tree is None:
+        tree = i3.get_tree()
+    for w in tree.workspaces():
         print('WORKSPACE: "{}"'.format(w.name))
         for i, l in enumerate(w.leaves()):
             print('===> leave: {}'.format(i))
@@ -291,6 +2601,122 @@ def _verbose_startup(i3):
                     print('-> {}: {}'.format(attr, value))
 
 
+def _rename_offline(rename, paths, lean=False):
+    """Print the rename commands of `rename` for the layout trees in the files `paths`.
+
+    Every tree is renamed on its own, as if the daemon had just started.
+    ``-`` reads a tree from stdin. The commands of a file follow a ``# path``
+    line, and the throughput of decoding and of renaming is printed to stderr.
+    """
+    decoding = renaming = 0.0
+    workspaces = windows = 0
+    for path in paths:
+        if path == "-":
+            data = stdin.read()
+        else:
+            with open(path, encoding="utf-8") as f:
+                data = f.read()
+        start = time.perf_counter()
+        tree = parse_tree(data) if lean else i3ipc.Con(json.loads(data), None, None)
+        decoding += time.perf_counter() - start
+        start = time.perf_counter()
+        rename.label_cache.invalidate()
+        commands = rename.plan(tree)
+        renaming += time.perf_counter() - start
+        for workspace in tree.workspaces():
+            workspaces += 1
+            windows += len(workspace.leaves())
+        print("# {}".format(path))
+        for command in commands:
+            print(command)
+
+    def rate(count, seconds):
+        return count / seconds if seconds else 0
+
+    print(
+        "{} trees, {} workspaces, {} windows: decoded in {:.3f} s ({:.0f} trees/s),"
+        " renamed in {:.3f} s ({:.0f} trees/s, {:.0f} windows/s)".format(
+            len(paths), workspaces, windows, decoding, rate(len(paths), decoding),
+            renaming, rate(len(paths), renaming), rate(windows, renaming),
+        ),
+        file=stderr,
+    )
+
+
+def _evaluate_corpus(labeller, path, slowest=10):
+    """Print the label and the key of the matching rule of every window in the corpus `path`.
+
+    The corpus holds a JSON object of window identifiers per line, ``-``
+    reads it from stdin. A JSON line ``{"label": ..., "rule": ...}`` is
+    printed for every window, and a report to stderr: the throughput, the
+    keys that matched no window and the `slowest` keys by mean time to
+    label the windows they matched. The windows are labelled by the
+    `Labeller` `labeller`.
+    """
+    classify = labeller.classify
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    clock = time.perf_counter
+    # key (None without a match): [windows, seconds]
+    costs = {}
+    rows = 0
+    output = []
+    f = stdin if path == "-" else open(path, encoding="utf-8")
+    start = clock()
+    try:
+        for line in f:
+            if not line.strip():
+                continue
+            window = WindowIdentifiers(json.loads(line))
+            before = clock()
+            label, rule = classify(window)
+            elapsed = clock() - before
+            key = None if rule is None else rule.key
+            cost = costs.get(key)
+            if cost is None:
+                cost = costs[key] = [0, 0.0]
+            cost[0] += 1
+            cost[1] += elapsed
+            rows += 1
+            output.append(encode({"label": label, "rule": key}))
+            # a write per line would cost more than the labelling
+            if len(output) == 4096:
+                output.append("")
+                stdout.write("\n".join(output))
+                output = []
+    finally:
+        if f is not stdin:
+            f.close()
+    if output:
+        output.append("")
+        stdout.write("\n".join(output))
+    stdout.flush()
+    total = time.perf_counter() - start
+    labelling = sum(seconds for _, seconds in costs.values())
+
+    print("{} windows in {:.3f} s ({:.0f} windows/s, {:.0f} labels/s)".format(
+        rows, total, rows / total if total else 0, rows / labelling if labelling else 0,
+    ), file=stderr)
+    print("no rule matched {} windows".format(costs.get(None, [0])[0]), file=stderr)
+    unused = [key for key in labeller.rules.keys if key not in costs and key != "_no_match"]
+    print("{} rules never matched:".format(len(unused)), file=stderr)
+    for key in unused:
+        print("  {}".format(key), file=stderr)
+    ranking = sorted(
+        ((seconds / count, count, key) for key, (count, seconds) in costs.items() if key is not None),
+        reverse=True,
+    )[:slowest]
+    print("slowest rules (mean time per window):", file=stderr)
+    for mean, count, key in ranking:
+        print("  {:9.2f} us  {:8d} windows  {}".format(mean * 1e6, count, key), file=stderr)
+    profile = labeller.rules.profile
+    if profile is not None:
+        print("rule profile (attempts, hits, match time):", file=stderr)
+        for entry in profile.as_dict()[:slowest]:
+            print("  {:8d}  {:8d}  {:9.3f} ms  {}".format(
+                entry["attempts"], entry["hits"], entry["seconds"] * 1e3, entry["rule"],
+            ), file=stderr)
+
+
 def _is_valid_re(regex):
     try:
         re.compile(regex)
@@ -333,12 +2759,27 @@ def _validate_dict_mapping(app, mapping):
                 file=stderr,
             )
 
+    match_on = mapping.get("match_on")
+    if match_on is not None:
+        identifiers = [match_on] if isinstance(match_on, str) else match_on
+        if not isinstance(identifiers, list) or any(
+            identifier not in WINDOW_IDENTIFIERS for identifier in identifiers
+        ):
+            err = True
+            print(
+                "'match_on' of app '{}' must be one or a list of {}!".format(
+                    app, ", ".join(WINDOW_IDENTIFIERS)
+                ),
+                file=stderr,
+            )
+
     return err
 
 
 def _validate_config(config):
     # check for missing icons and wrong configurations
     err = False
+    fa_icons = load_fa_icons(_referenced_icons(config))
     for app, value in config.items():
         icon_name = None
         if type(value) == str:
@@ -363,6 +2804,15 @@ def _validate_config(config):
                 file=stderr,
             )
 
+    # not an error, the config still works; only analysed once it is valid
+    for key, earlier in [] if err else _shadowed_rules(config):
+        print(
+            "Rule '{}' is never used, the earlier rule '{}' matches every window it matches.".format(
+                key, earlier
+            ),
+            file=stderr,
+        )
+
     return err
 
 
@@ -443,6 +2893,128 @@ def main() -> int:
         required=False,
         default=False,
     )
+    parser.add_argument(
+        "--debounce-ms",
+        help=("Coalesce bursts of events: rename at most once per this many milliseconds,"
+              " plus once after the burst. Title changes always wait for the end of the burst."
+              " Defaults to 0 (rename on every event)."),
+        required=False,
+        default=0,
+        type=int,
+    )
+    parser.add_argument(
+        "--async",
+        help=("Use the asyncio connection of i3ipc: events are received while a rename"
+              " is in flight, and a newer event cancels the outdated rename."),
+        dest="use_async",
+        action="store_true",
+        required=False,
+        default=False,
+    )
+    parser.add_argument(
+        "--shadow-tree",
+        help=("Keep a model of the workspaces and their windows up to date from the events,"
+              " and only fetch the whole tree when a window was opened or moved."),
+        action="store_true",
+        required=False,
+        default=False,
+    )
+    parser.add_argument(
+        "--ipc",
+        help=("IPC client to talk to i3 with: i3ipc (default) or the built-in client, which keeps"
+              " a socket for the commands apart from the events and implies --lean-tree."
+              " Not available with --async."),
+        choices=("i3ipc", "builtin"),
+        required=False,
+        default="i3ipc",
+    )
+    parser.add_argument(
+        "--title-cache-size",
+        help=("Number of transformed titles to remember, so a title seen before is not"
+              " transformed again. Defaults to 1024, 0 disables the cache."),
+        required=False,
+        default=1024,
+        type=int,
+    )
+    parser.add_argument(
+        "--background-commands",
+        help=("Send the rename commands from a background thread, on a connection of their own,"
+              " instead of waiting for i3 to reply before handling the next event. Renames"
+              " planned while a batch is being sent are merged into the next batch. Failed"
+              " commands are logged and retried on the next rename."),
+        action="store_true",
+        required=False,
+        default=False,
+    )
+    parser.add_argument(
+        "--lean-tree",
+        help=("Decode only the few fields of the layout tree that are needed for the names,"
+              " instead of building the full container objects of i3ipc."),
+        action="store_true",
+        required=False,
+        default=False,
+    )
+    parser.add_argument(
+        "--stats",
+        help=("Collect event counts and latencies of the rename loop,"
+              " and print them to stderr on SIGUSR1."),
+        action="store_true",
+        required=False,
+        default=False,
+    )
+    parser.add_argument(
+        "--stats-file",
+        help=("Collect the statistics of --stats and write them as JSON to this file"
+              " every 10 seconds while there are events, and on SIGUSR1."),
+        required=False,
+    )
+    parser.add_argument(
+        "--profile-rules",
+        help=("Match the rules one by one and count the attempts, hits and match time of"
+              " every rule, reported with the statistics of --stats (which it implies)."),
+        action="store_true",
+        required=False,
+        default=False,
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help=("Write every event and layout tree received from i3 with timestamps to the"
+              " trace FILE, compressed with gzip if it ends with .gz. See --replay."),
+        required=False,
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="FILE",
+        help=("Instead of connecting to i3, feed the trace FILE written with --record to the"
+              " rename as fast as possible and print the rename commands it sends."),
+        required=False,
+    )
+    parser.add_argument(
+        "--replay-realtime",
+        help="With --replay, wait between the events as long as during the recording.",
+        action="store_true",
+        required=False,
+        default=False,
+    )
+    parser.add_argument(
+        "--offline",
+        metavar="TREE",
+        nargs="+",
+        help=("Instead of connecting to i3, print the rename commands for the layout trees"
+              " dumped with `i3-msg -t get_tree` to the TREE files (- for stdin), and the"
+              " throughput to stderr."),
+        required=False,
+    )
+    parser.add_argument(
+        "--evaluate",
+        metavar="CORPUS",
+        help=("Instead of connecting to i3, label the windows of the JSON lines file CORPUS"
+              " (- for stdin), one object of window identifiers per line, and print the label"
+              " and the key of the matching rule of each as JSON lines. The throughput, the"
+              " rules that never matched and the slowest rules are printed to stderr."),
+        required=False,
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -460,36 +3032,130 @@ def main() -> int:
         required=False,
     )
     args = parser.parse_args()
+    if args.use_async and args.ipc == "builtin":  # pragma: no cover
+        parser.error("--ipc builtin is not available with --async")
+    if args.use_async and args.background_commands:  # pragma: no cover
+        parser.error("--background-commands is not available with --async")
+    if args.use_async and (args.record or args.replay):  # pragma: no cover
+        parser.error("--record and --replay are not available with --async")
+    if args.record and args.replay:  # pragma: no cover
+        parser.error("--record and --replay cannot be combined")
 
     if args.generate_icons:  # pragma: no cover
         generate_icons(args.generate_icons)
         return 0
 
-    mappings = _get_mapping(args.config_path)
+    config = _load_config(args.config_path, validate=not args.bypass_validation)
+    if config is None:  # pragma: no cover
+        print("Errors in configuration found!", file=stderr)
+        return 0
+    mappings, ws, icons = config
 
-    ws = {int(wsn): wsc for wsn, wsc in mappings.items() if wsn.isdigit()}
-    for wsn in ws.keys():
-        del mappings[str(wsn)]
+    if args.offline:
+        _rename_offline(
+            build_rename(None, mappings, ws, args, icons),
+            args.offline,
+            lean=args.lean_tree or args.ipc == "builtin",
+        )
+        return 0
 
-    if not args.bypass_validation and _validate_config(mappings):  # pragma: no cover
-        print("Errors in configuration found!", file=stderr)
+    if args.evaluate:
+        _evaluate_corpus(Labeller(mappings, args, icons), args.evaluate)
+        return 0
+
+    if args.use_async:
+        # asyncio takes longer to import than the rest of the daemon
+        import asyncio
+
+        asyncio.run(_main_async(mappings, ws, args, icons))
         return 0
 
     # build i3-connection
-    i3 = i3ipc.Connection()
+    if args.replay:
+        i3 = TraceConnection(args.replay, args.replay_realtime, lean=args.ipc == "builtin")
+    elif args.ipc == "builtin":
+        i3 = IPCConnection()
+    else:
+        i3 = i3ipc.Connection()
+    if args.ipc == "builtin":
+        # its get_tree already returns the lean tree
+        args.lean_tree = False
+    trace = None
+    if args.record:
+        trace = TraceWriter(args.record)
+        i3 = RecordingConnection(i3, trace)
     if args.verbose:
         _verbose_startup(i3)
 
-    rename = build_rename(i3, mappings, ws, args)
-    for _case in [
-        *[f"window::{ev}" for ev in ("move", "new", "title", "close")],
-        "workspace::init",
-    ]:
+    command_connection = None
+    if args.background_commands and not args.replay:
+        # on the connection of the events the next get_tree would wait until
+        # i3 has answered the batch being sent
+        command_connection = IPCConnection() if args.ipc == "builtin" else i3ipc.Connection()
+    rename = build_rename(i3, mappings, ws, args, icons, command_connection)
+    if rename.stats is not None:
+        signal.signal(signal.SIGUSR1, rename.stats.dump)
+
+    def reload(*_):
+        if _reload_config(rename, args):
+            rename(i3)
+
+    # not in the signal handler itself, it may have interrupted a rename
+    signal.signal(signal.SIGHUP, lambda *_: threading.Thread(target=reload, daemon=True).start())
+    for _case in RENAME_EVENTS + (SHADOW_TREE_EVENTS if args.shadow_tree else ()):
         i3.on(_case, rename)
     rename(i3)  # call @startup
-    i3.main()
+    try:
+        i3.main()
+    finally:
+        if trace is not None:
+            trace.close()
+    if args.replay:
+        _replay_summary(rename, i3)
     return 0
 
 
+def _replay_summary(rename, i3):
+    # the last passes of the replay may still be pending
+    if rename.scheduler is not None:
+        rename.scheduler.flush()
+    if rename.dispatcher is not None:
+        rename.dispatcher.flush()
+    commands = i3.commands
+    for command in commands:
+        print(command)
+    print(
+        "replayed {} events in {:.3f} s ({:.0f} events/s), {} commands".format(
+            i3.events, i3.elapsed, i3.events / i3.elapsed if i3.elapsed else 0, len(commands)
+        ),
+        file=stderr,
+    )
+
+
+async def _main_async(mappings, ws, args, icons=None):
+    # only needed in this mode
+    import asyncio
+    from i3ipc.aio import Connection
+
+    i3 = await Connection().connect()
+    if args.verbose:
+        _verbose_startup(i3, await i3.get_tree())
+
+    rename = build_async_rename(i3, mappings, ws, args, icons)
+    loop = asyncio.get_running_loop()
+    if rename.stats is not None:
+        loop.add_signal_handler(signal.SIGUSR1, rename.stats.dump)
+
+    def reload():
+        if _reload_config(rename, args):
+            asyncio.ensure_future(rename(i3))
+
+    loop.add_signal_handler(signal.SIGHUP, reload)
+    for _case in RENAME_EVENTS + (SHADOW_TREE_EVENTS if args.shadow_tree else ()):
+        i3.on(_case, rename)
+    await rename(i3)  # call @startup
+    await i3.main()
+
+
 if __name__ == "__main__":  # pragma: no cover
     main()
@@ -1,3 +1,20 @@
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+
+_con_ids = itertools.count(1)
+
+
 class AttrDict(dict):
     def __init__(self, *args, **kwargs):
         super(AttrDict, self).__init__(*args, **kwargs)
@@ -6,6 +23,7 @@ class AttrDict(dict):
 
 class MockLeaf:
     def __init__(self, name, title=None, instance=None, wc=None):
+        self.id = next(_con_ids)
         self.name = name
         if title is not None:
             self.window_title = title
@@ -23,6 +41,7 @@ class MockLeaf:
 
 class MockWorkspace:
     def __init__(self, num, *leaves):
+        self.id = next(_con_ids)
         self.num = num
         self.leaves_ = leaves
         self.visible = True
@@ -41,13 +60,79 @@ class MockTree:
         return self.mi3.workspaces
 
 
+def _rect(x=0, y=0, width=1920, height=1080):
+    return {"x": x, "y": y, "width": width, "height": height}
+
+
+def _con(con_type, name, nodes=(), **extra):
+    # every field i3 4.22 sends for a container
+    con = {
+        "id": next(_con_ids), "type": con_type, "orientation": "horizontal",
+        "scratchpad_state": "none", "percent": 1.0 / max(1, len(nodes)), "urgent": False,
+        "marks": [], "focused": False, "output": "eDP-1", "layout": "splith",
+        "workspace_layout": "default", "last_split_layout": "splith", "border": "normal",
+        "current_border_width": 2, "rect": _rect(), "deco_rect": _rect(height=22),
+        "window_rect": _rect(2, 0, 1916, 1078), "geometry": _rect(0, 0, 800, 600),
+        "name": name, "window_icon_padding": -1, "window": None, "window_type": None,
+        "nodes": list(nodes), "floating_nodes": [], "focus": [], "fullscreen_mode": 0,
+        "sticky": False, "floating": "auto_off", "swallows": [],
+    }
+    con.update(extra)
+    return con
+
+
+def leaf_con(leaf):
+    """The container of i3 for a `MockLeaf`, as decoded JSON."""
+    return _con("con", leaf.name, id=leaf.id, window=leaf.id * 1000, window_type="normal",
+                window_properties={
+                    "class": leaf.window_class, "instance": leaf.window_instance,
+                    "window_role": "browser", "machine": "localhost",
+                    "title": leaf.window_title, "transient_for": None,
+                })
+
+
+def workspace_con(ws):
+    """The container of i3 for a `MockWorkspace` and its leaves, as decoded JSON."""
+    return _con(
+        "workspace", ws.name, [leaf_con(leaf) for leaf in ws.leaves()],
+        id=ws.id, num=ws.num, fullscreen_mode=1,
+        gaps={"inner": 0, "outer": 0, "top": 0, "right": 0, "bottom": 0, "left": 0},
+    )
+
+
+def tree_reply(workspaces):
+    """The GET_TREE reply of i3 for `MockWorkspace` objects, as a JSON string."""
+    content = [workspace_con(ws) for ws in workspaces]
+    scratch = _con("workspace", "__i3_scratch", num=-1)
+    # the bar is a window outside of any workspace
+    bar = _con("con", "i3bar for output eDP-1", window=1, window_type="dock", window_properties={
+        "class": "i3bar", "instance": "i3bar", "title": "i3bar for output eDP-1", "transient_for": None,
+    })
+    outputs = [
+        _con("output", "__i3", [_con("con", "content", [scratch])]),
+        _con("output", "eDP-1", [
+            _con("dockarea", "topdock", [bar]),
+            _con("con", "content", content),
+            _con("dockarea", "bottomdock"),
+        ]),
+    ]
+    return json.dumps(_con("root", "root", outputs))
+
+
 class MockI3:
     def __init__(self, *workspaces):
         self.workspaces = workspaces
+        self.get_tree_calls = 0
 
     def get_tree(self):
+        self.get_tree_calls += 1
         return MockTree(self)
 
+    def _message(self, message_type, payload=""):
+        # only GET_TREE is answered, like i3ipc as a str
+        self.get_tree_calls += 1
+        return tree_reply(self.workspaces)
+
     def get_workspaces(self):
         return self.workspaces
 
@@ -59,3 +144,236 @@ class MockI3:
 
     def main(self):
         self.rename(self, None)
+
+
+class MockAsyncI3(MockI3):
+    """`MockI3` with the coroutine API of `i3ipc.aio.Connection`."""
+
+    def __init__(self, *workspaces, delay=0):
+        super().__init__(*workspaces)
+        self.delay = delay
+        self.commands = []
+
+    async def get_tree(self):
+        self.get_tree_calls += 1
+        await asyncio.sleep(self.delay)
+        return MockTree(self)
+
+    async def command(self, cmd):
+        self.cmd = cmd
+        self.commands.append(cmd)
+
+    async def _message(self, message_type, payload=""):
+        self.get_tree_calls += 1
+        await asyncio.sleep(self.delay)
+        return tree_reply(self.workspaces).encode()
+
+    async def connect(self):
+        return self
+
+    async def main(self):
+        await self.rename(self, None)
+        await asyncio.sleep(self.delay + 0.01)
+
+
+_HEADER = struct.Struct("=6sII")
+_EVENTS = ("workspace", "output", "mode", "window", "barconfig_update", "binding", "shutdown", "tick")
+
+
+_RENAME = re.compile(r'\s*rename workspace "((?:[^"\\]|\\.)*)" to "((?:[^"\\]|\\.)*)"\s*$')
+
+
+def _unquote(name):
+    return name.replace('\\"', '"')
+
+
+class FakeI3Server:
+    """An i3 IPC server on a Unix socket, answering from `MockWorkspace` objects.
+
+    Answers RUN_COMMAND (recording the commands and applying the workspace
+    renames), GET_TREE, SUBSCRIBE and SEND_TICK, and sends the events passed
+    to `emit` to the subscribers. `open_window`, `retitle` and `move` change
+    the windows like a user would and emit the matching events, `storm` does
+    so at given rates.
+
+    Attributes
+    ----------
+    commands: `list[str]`
+        Payloads of the RUN_COMMAND requests.
+    command_times: `list[float]`
+        ``time.perf_counter()`` at the arrival of every command.
+    emitted: `list[tuple]`
+        (``time.perf_counter()``, event name, change) of the emitted events.
+    """
+
+    def __init__(self, *workspaces, apps=("firefox", "chromium-browser", "x-terminal-emulator")):
+        self.workspaces = workspaces
+        self.apps = apps
+        self.commands = []
+        self.command_times = []
+        self.requests = []
+        self.emitted = []
+        self.subscribed = threading.Event()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        # guards the workspaces and windows against the connection threads
+        self._model_lock = threading.RLock()
+        self._titles = itertools.count(1)
+        self._dir = tempfile.mkdtemp()
+        self.path = os.path.join(self._dir, "ipc.sock")
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        self._server.listen()
+        self._connections = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        for conn in [self._server] + self._connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            self._connections.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _recv(conn, size):
+        data = b""
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError
+            data += chunk
+        return data
+
+    def _send(self, conn, message_type, payload):
+        data = json.dumps(payload) if not isinstance(payload, str) else payload
+        data = data.encode()
+        with self._lock:
+            conn.sendall(_HEADER.pack(b"i3-ipc", len(data), message_type) + data)
+
+    def _serve(self, conn):
+        try:
+            while True:
+                _, length, message_type = _HEADER.unpack(self._recv(conn, _HEADER.size))
+                payload = self._recv(conn, length).decode()
+                self.requests.append(message_type)
+                self._handle(conn, message_type, payload)
+        except OSError:
+            pass
+
+    def _handle(self, conn, message_type, payload):
+        if message_type == 0:
+            self.command_times.append(time.perf_counter())
+            self.commands.append(payload)
+            self._send(conn, 0, [self._run(command) for command in payload.split(";")])
+        elif message_type == 2:
+            names = set(json.loads(payload))
+            self._send(conn, 2, {"success": True})
+            self._subscribers.append((conn, names))
+            if "tick" in names:
+                self._send(conn, 7 | 1 << 31, {"first": True, "payload": ""})
+            self.subscribed.set()
+        elif message_type == 4:
+            with self._model_lock:
+                reply = tree_reply(self.workspaces)
+            self._send(conn, 4, reply)
+        elif message_type == 10:
+            self._send(conn, 10, {"success": True})
+            self.emit("tick", {"first": False, "payload": payload})
+        else:
+            self._send(conn, message_type, {"success": False, "error": "not implemented"})
+
+    def _run(self, command):
+        # anything but a workspace rename is accepted without doing anything
+        match = _RENAME.match(command)
+        if match is None:
+            return {"success": True}
+        old, new = map(_unquote, match.groups())
+        with self._model_lock:
+            workspace = next((ws for ws in self.workspaces if ws.name == old), None)
+            if workspace is None:
+                return {"success": False, "error": "Old workspace \"{}\" not found".format(old)}
+            workspace.name = new
+            current = workspace_con(workspace)
+        self.emit("workspace", {"change": "rename", "current": current, "old": None})
+        return {"success": True}
+
+    def emit(self, name, payload):
+        """Send the event `name` (e.g. ``"window"``) with `payload` to its subscribers."""
+        self.emitted.append((time.perf_counter(), name, payload.get("change")))
+        for conn, names in list(self._subscribers):
+            if name in names:
+                self._send(conn, _EVENTS.index(name) | 1 << 31, payload)
+
+    def _window_event(self, change, leaf):
+        self.emit("window", {"change": change, "container": leaf_con(leaf)})
+
+    def _windows(self):
+        return [(ws, leaf) for ws in self.workspaces for leaf in ws.leaves()]
+
+    def open_window(self, rng=random):
+        """Open a window of a random app on a random workspace."""
+        with self._model_lock:
+            workspace = rng.choice(self.workspaces)
+            leaf = MockLeaf(rng.choice(self.apps))
+            workspace.leaves_ = tuple(workspace.leaves_) + (leaf,)
+            self._window_event("new", leaf)
+
+    def retitle(self, rng=random):
+        """Give a random window a new title."""
+        with self._model_lock:
+            windows = self._windows()
+            if not windows:
+                return
+            _, leaf = rng.choice(windows)
+            leaf.name = leaf.window_title = "{} {}".format(leaf.window_class, next(self._titles))
+            self._window_event("title", leaf)
+
+    def move(self, rng=random):
+        """Move a random window to another random workspace."""
+        with self._model_lock:
+            windows = self._windows()
+            if not windows or len(self.workspaces) < 2:
+                return
+            source, leaf = rng.choice(windows)
+            target = rng.choice([ws for ws in self.workspaces if ws is not source])
+            source.leaves_ = tuple(other for other in source.leaves_ if other is not leaf)
+            target.leaves_ = tuple(target.leaves_) + (leaf,)
+            self._window_event("move", leaf)
+
+    def storm(self, duration, opens=0, titles=0, moves=0, seed=0):
+        """Open, retitle and move windows at the given rates per second for `duration` seconds.
+
+        Returns the number of changes scheduled; retitling or moving is skipped while
+        there is no window to change.
+        """
+        rng = random.Random(seed)
+        rates = ((self.open_window, opens), (self.retitle, titles), (self.move, moves))
+        schedule = sorted(
+            ((n / rate, change) for change, rate in rates if rate > 0
+             for n in range(int(duration * rate))),
+            key=lambda item: item[0],
+        )
+        start = time.perf_counter()
+        for offset, change in schedule:
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            change(rng)
+        return len(schedule)
@@ -0,0 +1,55 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+from mocks import AttrDict, MockAsyncI3, MockLeaf, MockWorkspace
+
+from i3_workspace_names_daemon import build_async_rename
+from test_rename import base_config, base_mappings, get_names
+
+
+def new_window(leaf):
+    return AttrDict(change="new", container=leaf)
+
+
+class TestAsyncRename(unittest.TestCase):
+    def run_events(self, mi3, *events, settle=0.05, **options):
+        async def run():
+            rename = build_async_rename(mi3, base_mappings(), {}, AttrDict(base_config(), **options))
+            for event in events:
+                await rename(mi3, event)
+                await asyncio.sleep(0)
+            await asyncio.sleep(settle)
+            return rename
+        return asyncio.run(run())
+
+    def test_rename(self):
+        mi3 = MockAsyncI3(MockWorkspace(1, MockLeaf("firefox")))
+        self.run_events(mi3, None)
+        self.assertListEqual(["1: \uf269"], get_names(mi3.cmd))
+
+    def test_stale_rename_cancelled(self):
+        leaf = MockLeaf("firefox")
+        mi3 = MockAsyncI3(MockWorkspace(1, leaf), delay=0.01)
+        self.run_events(mi3, new_window(leaf), new_window(leaf))
+        # the first tree was still being fetched, only the second one is used
+        self.assertEqual(2, mi3.get_tree_calls)
+        self.assertEqual(1, len(mi3.commands))
+
+    def test_no_starvation(self):
+        leaf = MockLeaf("firefox")
+        mi3 = MockAsyncI3(MockWorkspace(1, leaf), delay=0.01)
+        self.run_events(mi3, *[new_window(leaf)] * 10, settle=0.1)
+        self.assertEqual(2, len(mi3.commands))
+
+    def test_nothing_to_rename(self):
+        mi3 = MockAsyncI3(MockWorkspace(1))
+        mi3.workspaces[0].name = "1"
+        self.run_events(mi3, None)
+        self.assertListEqual([], mi3.commands)
+
+    def test_debounce_without_threads(self):
+        mi3 = MockAsyncI3(MockWorkspace(1, MockLeaf("firefox")))
+        with patch("i3_workspace_names_daemon.RenameScheduler") as scheduler:
+            self.run_events(mi3, None, settle=0.1, debounce_ms=20)
+        scheduler.assert_not_called()
+        self.assertListEqual(["1: \uf269"], get_names(mi3.cmd))
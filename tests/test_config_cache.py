@@ -0,0 +1,83 @@
+import json
+import os
+from unittest.mock import patch
+
+import i3_workspace_names_daemon
+from i3_workspace_names_daemon import _load_config
+
+
+def write_config(tmp_path, config):
+    path = tmp_path / 'app-icons.json'
+    path.write_text(json.dumps(config))
+    return str(path)
+
+
+def cache_files(cache_home):
+    return os.listdir(cache_home / 'i3-workspace-names-daemon')
+
+
+def test_compiled_and_cached(tmp_path, cache_home):
+    path = write_config(tmp_path, {"Firefox": "firefox", "1": "chrome"})
+    mappings, ws, icons = _load_config(path)
+    assert mappings == {"firefox": "firefox"}
+    assert ws == {1: "chrome"}
+    assert icons == {"firefox": "\uf269", "chrome": "\uf268"}
+    assert len(cache_files(cache_home)) == 1
+
+
+def test_cache_hit_skips_validation(tmp_path):
+    path = write_config(tmp_path, {"firefox": "firefox"})
+    first = _load_config(path)
+    with patch.object(i3_workspace_names_daemon, '_validate_config') as validate:
+        assert _load_config(path) == first
+    validate.assert_not_called()
+
+
+def test_fixed_workspaces_from_cache(tmp_path, cache_home):
+    path = write_config(tmp_path, {"firefox": "firefox", "2": "chrome"})
+    first = _load_config(path)
+    (cache_name,) = cache_files(cache_home)
+    with open(cache_home / 'i3-workspace-names-daemon' / cache_name) as f:
+        json.load(f)
+    mappings, ws, icons = _load_config(path)
+    assert ws == {2: "chrome"}
+    assert (mappings, ws, icons) == first
+
+
+def test_changed_config_replaces_cache(tmp_path, cache_home):
+    path = write_config(tmp_path, {"firefox": "firefox"})
+    _load_config(path)
+    old = cache_files(cache_home)
+    write_config(tmp_path, {"firefox": "chrome"})
+    mappings, _, _ = _load_config(path)
+    assert mappings == {"firefox": "chrome"}
+    assert len(cache_files(cache_home)) == 1
+    assert cache_files(cache_home) != old
+
+
+def test_invalid_config_not_cached(tmp_path, cache_home):
+    path = write_config(tmp_path, {"firefox": "does-not-exist"})
+    assert _load_config(path) is None
+    assert not os.path.exists(cache_home / 'i3-workspace-names-daemon')
+
+
+def test_corrupt_cache_ignored(tmp_path, cache_home):
+    path = write_config(tmp_path, {"firefox": "firefox"})
+    first = _load_config(path)
+    (cache_name,) = cache_files(cache_home)
+    (cache_home / 'i3-workspace-names-daemon' / cache_name).write_bytes(b'garbage')
+    assert _load_config(path) == first
+
+
+def test_other_config_keeps_its_cache(tmp_path, cache_home):
+    first = write_config(tmp_path, {"firefox": "firefox"})
+    other = tmp_path / 'other'
+    other.mkdir()
+    second = write_config(other, {"firefox": "chrome"})
+    _load_config(first)
+    _load_config(second)
+    assert len(cache_files(cache_home)) == 2
+    with patch.object(i3_workspace_names_daemon, '_validate_config') as validate:
+        _load_config(first)
+        _load_config(second)
+    validate.assert_not_called()
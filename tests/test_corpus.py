@@ -0,0 +1,44 @@
+import unittest
+from mocks import AttrDict, MockLeaf
+
+from i3_workspace_names_daemon import Labeller, WindowIdentifiers, label_windows
+from test_rename import base_config, base_mappings
+
+
+class TestLabelWindows(unittest.TestCase):
+    def test_labels_and_rules(self):
+        mappings = base_mappings()
+        mappings["emacs"] = {"transform_title": {"from": r".*\[(.+?)\].*", "to": r"\1"}}
+        windows = [
+            WindowIdentifiers({"window_class": "Firefox"}),
+            WindowIdentifiers({"name": "x", "window_title": "emacs [src] -", "window_class": "Emacs"}),
+            WindowIdentifiers({"window_instance": "vlc", "window_class": "vlc"}),
+            MockLeaf("chromium-browser"),
+        ]
+        results = list(label_windows(windows, mappings, AttrDict(base_config())))
+        self.assertEqual(
+            ["\uf269", "src", "vlc", "\uf268"], [label for label, _ in results]
+        )
+        self.assertEqual(
+            ["firefox", "emacs", None, "chromium-browser"],
+            [None if rule is None else rule.key for _, rule in results],
+        )
+
+    def test_missing_identifiers(self):
+        window = WindowIdentifiers({})
+        self.assertEqual([None] * 5, [getattr(window, attr) for attr in window.__slots__])
+        self.assertEqual([("?", None)], list(label_windows([window], {}, AttrDict(base_config()))))
+
+
+class TestLabeller(unittest.TestCase):
+    def setUp(self):
+        self.labeller = Labeller(base_mappings(), AttrDict(base_config()))
+
+    def test_classify(self):
+        label, rule = self.labeller.classify(MockLeaf("firefox"))
+        self.assertEqual(("\uf269", "firefox"), (label, rule.key))
+        self.assertEqual(("vlc", None), self.labeller.classify(MockLeaf("vlc")))
+
+    def test_label_depends_on_matched_identifier(self):
+        # the name is the first identifier, no other one can change the label
+        self.assertEqual(("\uf269", (0,)), self.labeller.label(MockLeaf("firefox")))
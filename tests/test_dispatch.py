@@ -0,0 +1,166 @@
+import io
+import re
+import threading
+import unittest
+from unittest.mock import patch
+from mocks import AttrDict, MockI3, MockLeaf, MockWorkspace
+
+from i3_workspace_names_daemon import build_rename, _command_errors
+from test_rename import base_config, base_mappings, get_names
+
+
+class ReplyingI3(MockI3):
+    """`MockI3` replying like i3, failing the commands that contain `fail`.
+
+    The renames that succeed are applied to the workspaces.
+    """
+
+    def __init__(self, *workspaces):
+        super().__init__(*workspaces)
+        self.commands = []
+        self.fail = None
+        self.sending = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def command(self, cmd):
+        self.sending.set()
+        self.release.wait(5)
+        self.cmd = cmd
+        self.commands.append(cmd)
+        replies = []
+        for command in cmd.split(";"):
+            if self.fail is not None and self.fail in command:
+                replies.append({"success": False, "error": "already exists"})
+                continue
+            old, new = re.fullmatch(r'rename workspace "(.*)" to "(.*)"', command).groups()
+            for workspace in self.workspaces:
+                if workspace.name == old:
+                    workspace.name = new
+                    break
+            else:
+                replies.append({"success": False, "error": "no such workspace"})
+                continue
+            replies.append({"success": True})
+        return replies
+
+
+class TestCommandErrors(unittest.TestCase):
+    def test_errors(self):
+        commands = ["a", "b"]
+        self.assertEqual([], _command_errors(commands, None))
+        self.assertEqual([("b", "no")], _command_errors(
+            commands, [{"success": True}, {"success": False, "error": "no"}]))
+        self.assertEqual([("b", "no")], _command_errors(
+            commands, [AttrDict(success=True, error=None), AttrDict(success=False, error="no")]))
+        # without one reply per command the whole batch is reported
+        self.assertEqual([("a;b", None)], _command_errors(commands, [{"success": False}]))
+
+
+class TestBackgroundCommands(unittest.TestCase):
+    def setUp(self):
+        self.leaf = MockLeaf("firefox")
+        self.mi3 = ReplyingI3(MockWorkspace(1, self.leaf), MockWorkspace(2, MockLeaf("chromium-browser")))
+        self.args = AttrDict(base_config(), background_commands=True)
+        self.args.verbose = False
+
+    def build(self, **args):
+        self.args.update(args)
+        return build_rename(self.mi3, base_mappings(), {}, self.args)
+
+    def flush(self, rename):
+        self.assertTrue(rename.dispatcher.flush(5))
+
+    def test_does_not_wait_for_reply(self):
+        rename = self.build()
+        self.mi3.release.clear()
+        rename(self.mi3)
+        self.assertEqual([], self.mi3.commands)
+        self.mi3.release.set()
+        self.flush(rename)
+        self.assertListEqual(["1: \uf269", "2: \uf268"], get_names(self.mi3.cmd))
+
+    def relabel(self, rename, name):
+        self.leaf.name = self.leaf.window_class = self.leaf.window_title = name
+        self.leaf.window_instance = name
+        rename(self.mi3, AttrDict(change="title", container=self.leaf))
+
+    def test_merged_while_in_flight(self):
+        rename = self.build(shadow_tree=True)
+        self.mi3.release.clear()
+        rename(self.mi3)
+        self.assertTrue(self.mi3.sending.wait(5))
+        self.relabel(rename, "chromium-browser")
+        self.relabel(rename, "vlc")
+        self.mi3.release.set()
+        self.flush(rename)
+        # the intermediate name is never sent
+        self.assertEqual([
+            'rename workspace "" to "1: \uf269";rename workspace "" to "2: \uf268"',
+            'rename workspace "1: \uf269" to "1: vlc"',
+        ], self.mi3.commands)
+        self.assertEqual((2, 1), (rename.dispatcher.batches, rename.dispatcher.merged))
+
+    def test_merged_while_in_flight_without_shadow_tree(self):
+        rename = self.build()
+        self.mi3.release.clear()
+        rename(self.mi3)
+        self.assertTrue(self.mi3.sending.wait(5))
+
+        def relabel():
+            self.relabel(rename, "chromium-browser")
+            self.relabel(rename, "vlc")
+
+        # the trees fetched meanwhile do not show the names being sent yet
+        thread = threading.Thread(target=relabel, daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(2, self.mi3.get_tree_calls - 1)
+        self.mi3.release.set()
+        self.flush(rename)
+        self.assertEqual([
+            'rename workspace "" to "1: \uf269";rename workspace "" to "2: \uf268"',
+            'rename workspace "1: \uf269" to "1: vlc"',
+        ], self.mi3.commands)
+        self.assertEqual((2, 1), (rename.dispatcher.batches, rename.dispatcher.merged))
+        self.assertEqual(["1: vlc", "2: \uf268"], [ws.name for ws in self.mi3.workspaces])
+        self.assertEqual({}, rename.dispatcher.expected_names())
+
+    def test_renamed_back_dropped(self):
+        rename = self.build(shadow_tree=True)
+        self.mi3.release.clear()
+        rename(self.mi3)
+        self.assertTrue(self.mi3.sending.wait(5))
+        self.relabel(rename, "chromium-browser")
+        self.relabel(rename, "firefox")
+        self.mi3.release.set()
+        self.flush(rename)
+        self.assertEqual(1, len(self.mi3.commands))
+        self.assertEqual((1, 2), (rename.dispatcher.batches, rename.dispatcher.merged))
+
+    def test_failure_logged_and_retried(self):
+        rename = self.build(shadow_tree=True)
+        self.mi3.fail = "2: "
+        with patch("i3_workspace_names_daemon.stderr", io.StringIO()) as err:
+            rename(self.mi3)
+            self.flush(rename)
+        self.assertIn("Command failed (already exists)", err.getvalue())
+        self.assertTrue(rename.shadow.stale)
+        self.mi3.fail = None
+        calls = self.mi3.get_tree_calls
+        self.leaf.window_title = "chromium-browser"
+        self.leaf.name = self.leaf.window_class = "chromium-browser"
+        rename(self.mi3, AttrDict(change="title", container=self.leaf))
+        self.flush(rename)
+        # the whole tree is fetched and workspace 2 renamed again
+        self.assertEqual(calls + 1, self.mi3.get_tree_calls)
+        self.assertListEqual(["1: \uf268", "2: \uf268"], [ws.name for ws in self.mi3.workspaces])
+
+    def test_failure_without_background(self):
+        self.args.background_commands = False
+        rename = build_rename(self.mi3, base_mappings(), {}, self.args)
+        self.mi3.fail = "1: "
+        with patch("i3_workspace_names_daemon.stderr", io.StringIO()) as err:
+            rename(self.mi3)
+        self.assertIn('Command failed (already exists): rename workspace "" to "1: ', err.getvalue())
@@ -0,0 +1,22 @@
+import sys
+import unittest
+
+from i3_workspace_names_daemon import load_fa_icons
+
+
+class TestLoadFaIcons(unittest.TestCase):
+    def test_requested_only(self):
+        icons = load_fa_icons(["firefox", "chrome", "does-not-exist"])
+        self.assertDictEqual({"firefox": "\uf269", "chrome": "\uf268"}, icons)
+
+    def test_empty(self):
+        self.assertDictEqual({}, load_fa_icons([]))
+
+    def test_not_imported(self):
+        sys.modules.pop("fa_icons", None)
+        load_fa_icons(["firefox"])
+        self.assertNotIn("fa_icons", sys.modules)
+
+    def test_whole_table(self):
+        from fa_icons import icons
+        self.assertDictEqual(icons, load_fa_icons(icons))
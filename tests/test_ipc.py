@@ -0,0 +1,130 @@
+import threading
+import unittest
+from mocks import AttrDict, FakeI3Server, MockLeaf, MockWorkspace, leaf_con, workspace_con
+
+from i3_workspace_names_daemon import (
+    IPC_GET_TREE, IPC_RUN_COMMAND, IPCConnection, RENAME_EVENTS, TreeWindow, build_rename,
+)
+from test_rename import base_config, base_mappings, get_names
+
+
+class TestIPCConnection(unittest.TestCase):
+    def setUp(self):
+        self.firefox = MockLeaf("firefox")
+        self.server = FakeI3Server(MockWorkspace(1, self.firefox), MockWorkspace(2))
+        self.addCleanup(self.server.close)
+        self.i3 = IPCConnection(self.server.path)
+        self.addCleanup(self.i3.close)
+
+    def run_main(self):
+        thread = threading.Thread(target=self.i3.main, daemon=True)
+        thread.start()
+        self.assertTrue(self.server.subscribed.wait(5))
+        return thread
+
+    def test_command(self):
+        self.assertEqual([{"success": True}] * 2, self.i3.command("nop a; nop b"))
+        self.assertEqual(["nop a; nop b"], self.server.commands)
+
+    def test_get_tree(self):
+        workspaces = self.i3.get_tree().workspaces()
+        self.assertEqual([1, 2], [ws.num for ws in workspaces])
+        self.assertEqual(["firefox"], [leaf.window_class for leaf in workspaces[0].leaves()])
+
+    def test_large_reply(self):
+        self.server.workspaces = [
+            MockWorkspace(num, *[MockLeaf("app{}".format(i)) for i in range(50)])
+            for num in range(1, 11)
+        ]
+        tree = self.i3.get_tree()
+        self.assertEqual(500, sum(len(ws.leaves()) for ws in tree.workspaces()))
+        # the reused buffer grew, and requests still work afterwards
+        self.assertGreater(len(self.i3._cmd_reader.buffer), 1 << 16)
+        self.assertEqual([{"success": True}], self.i3.command("nop"))
+
+    def test_pipeline(self):
+        tree, reply = self.i3.pipeline((IPC_GET_TREE, ""), (IPC_RUN_COMMAND, "nop"))
+        self.assertIn('"firefox"', tree)
+        self.assertEqual('[{"success": true}]', reply)
+        self.assertEqual([IPC_GET_TREE, IPC_RUN_COMMAND], self.server.requests)
+
+    def test_events(self):
+        events = []
+        self.i3.on("window::new", lambda i3, event: events.append(("new", event)))
+        self.i3.on("window", lambda i3, event: events.append(("window", event)))
+        self.i3.on("workspace::init", lambda i3, event: events.append(("init", event)))
+        thread = self.run_main()
+        self.server.emit("window", {"change": "title", "container": leaf_con(self.firefox)})
+        self.server.emit("window", {"change": "new", "container": leaf_con(self.firefox)})
+        self.server.emit("workspace", {
+            "change": "init", "current": workspace_con(MockWorkspace(3)), "old": None,
+        })
+        self.server.emit("shutdown", {"change": "exit"})
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(["window", "window", "new", "init"], [name for name, _ in events])
+        container = events[0][1].container
+        self.assertIs(TreeWindow, type(container))
+        self.assertEqual((self.firefox.id, "firefox"), (container.id, container.window_title))
+        self.assertEqual(3, events[3][1].current.num)
+
+    def test_tick_and_main_quit(self):
+        ticks = []
+        self.i3.on("tick", lambda i3, event: ticks.append(event.payload))
+        thread = self.run_main()
+        self.assertTrue(self.i3.send_tick("ping"))
+        for _ in range(100):
+            if len(ticks) == 2:
+                break
+            thread.join(0.01)
+        self.i3.main_quit()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        # i3 sends an empty tick on subscribing
+        self.assertEqual(["", "ping"], ticks)
+
+    def test_rename(self):
+        rename = build_rename(self.i3, base_mappings(), {}, AttrDict(base_config()))
+        for event in RENAME_EVENTS:
+            self.i3.on(event, rename)
+        thread = self.run_main()
+        rename(self.i3)
+        self.firefox.name = self.firefox.window_class = "chromium-browser"
+        # commands are sent from the event handler while events keep arriving
+        self.server.emit("window", {"change": "new", "container": leaf_con(self.firefox)})
+        self.server.emit("shutdown", {"change": "exit"})
+        thread.join(5)
+        # the server applied the first renames, only workspace 1 changes afterwards
+        self.assertEqual(
+            [["1: \uf269", "2"], 'rename workspace "1: \uf269" to "1: \uf268"'],
+            [get_names(self.server.commands[0]), self.server.commands[1]],
+        )
+        self.assertEqual(["1: \uf268", "2"], [ws.name for ws in self.server.workspaces])
+
+
+class TestFakeI3Server(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeI3Server(MockWorkspace(1), MockWorkspace(2))
+        self.addCleanup(self.server.close)
+        self.i3 = IPCConnection(self.server.path)
+        self.addCleanup(self.i3.close)
+
+    def test_rename_unknown_workspace(self):
+        reply = self.i3.command('rename workspace "" to "1: a"; rename workspace "x" to "y"')
+        self.assertEqual([True, False], [result["success"] for result in reply])
+        self.assertEqual(["1: a", ""], [ws.name for ws in self.server.workspaces])
+
+    def test_storm(self):
+        changes = []
+        self.i3.on("window", lambda i3, event: changes.append(event.change))
+        thread = threading.Thread(target=self.i3.main, daemon=True)
+        thread.start()
+        self.assertTrue(self.server.subscribed.wait(5))
+        self.assertEqual(12, self.server.storm(0.1, opens=40, titles=50, moves=30))
+        self.server.emit("shutdown", {"change": "exit"})
+        thread.join(5)
+        self.assertEqual({"new": 4, "title": 5, "move": 3}, {
+            change: changes.count(change) for change in ("new", "title", "move")
+        })
+        windows = [leaf for ws in self.i3.get_tree().workspaces() for leaf in ws.leaves()]
+        self.assertEqual(4, len(windows))
@@ -0,0 +1,125 @@
+import unittest
+from mocks import AttrDict, MockLeaf, MockWorkspace, MockI3
+
+from i3_workspace_names_daemon import build_rename
+from test_rename import base_config, base_mappings, get_names
+
+
+class TestLabelCache(unittest.TestCase):
+    def setUp(self):
+        self.leaf = MockLeaf("firefox")
+        self.mi3 = MockI3(MockWorkspace(1, self.leaf, MockLeaf("chromium-browser")))
+        self.rename = build_rename(self.mi3, base_mappings(), {}, AttrDict(base_config()))
+        self.cache = self.rename.label_cache
+
+    def test_hits_on_unchanged_windows(self):
+        self.rename(self.mi3)
+        self.assertEqual((0, 2), (self.cache.hits, self.cache.misses))
+        self.rename(self.mi3)
+        self.assertEqual((2, 2), (self.cache.hits, self.cache.misses))
+
+    def test_changed_identifiers_miss(self):
+        self.rename(self.mi3)
+        self.leaf.name = "chromium-browser"
+        self.rename(self.mi3)
+        self.assertEqual((1, 3), (self.cache.hits, self.cache.misses))
+        self.assertListEqual(["1: \uf268|\uf268"], get_names(self.mi3.cmd))
+
+    def test_title_event_refreshes(self):
+        self.rename(self.mi3)
+        self.leaf.name = "Firefox - a page"
+        self.rename(self.mi3, AttrDict(change="title", container=self.leaf))
+        # the label did not change, so there is no rename pass afterwards
+        self.assertEqual((0, 3), (self.cache.hits, self.cache.misses))
+
+    def test_independent_identifier_short_circuits(self):
+        self.rename(self.mi3)
+        # the label comes from the name, the first identifier
+        self.leaf.window_class = "chromium-browser"
+        self.rename(self.mi3, AttrDict(change="title", container=self.leaf))
+        self.assertEqual((0, 2, 1), (self.cache.hits, self.cache.misses, self.cache.short_circuits))
+        self.rename(self.mi3)
+        self.assertEqual((2, 2), (self.cache.hits, self.cache.misses))
+
+    def test_close_event_evicts(self):
+        self.rename(self.mi3)
+        closed = self.mi3.workspaces[0].leaves_[1]
+        self.mi3.workspaces[0].leaves_ = (self.leaf,)
+        self.rename(self.mi3, AttrDict(change="close", container=closed))
+        self.assertEqual(1, len(self.cache))
+
+    def test_vanished_windows_dropped(self):
+        self.rename(self.mi3)
+        self.mi3.workspaces[0].leaves_ = ()
+        self.rename(self.mi3)
+        self.assertEqual(0, len(self.cache))
+
+
+class TestTitleFastPath(unittest.TestCase):
+    def setUp(self):
+        mappings = base_mappings()
+        mappings["emacs"] = {"transform_title": {"from": r".*\[(.+?)\].*", "to": r"\1"}}
+        self.firefox = MockLeaf("firefox")
+        self.emacs = MockLeaf("emacs", "foo [bar] baz")
+        self.mi3 = MockI3(MockWorkspace(1, self.firefox, self.emacs))
+        self.rename = build_rename(self.mi3, mappings, {}, AttrDict(base_config()))
+        self.rename(self.mi3)
+        del self.mi3.cmd
+
+    def test_unchanged_label_skips_rename(self):
+        self.firefox.window_title = "Mozilla Firefox - a page"
+        self.rename(self.mi3, AttrDict(change="title", container=self.firefox))
+        self.assertFalse(hasattr(self.mi3, "cmd"))
+
+    def test_changed_label_renames(self):
+        self.emacs.window_title = "foo [qux] baz"
+        self.rename(self.mi3, AttrDict(change="title", container=self.emacs))
+        self.assertListEqual(["1: \uf269|qux"], get_names(self.mi3.cmd))
+
+    def test_unknown_window_renames(self):
+        self.rename(self.mi3, AttrDict(change="title", container=MockLeaf("vlc")))
+        self.assertTrue(hasattr(self.mi3, "cmd"))
+
+
+class TestTitleDependencies(unittest.TestCase):
+    def setUp(self):
+        mappings = {
+            "firefox": {"icon": "firefox", "match_on": "window_class"},
+            "emacs": {
+                "match_on": "window_class",
+                "transform_title": {"from": r".*\[(.+?)\].*", "to": r"\1"},
+            },
+        }
+        self.firefox = MockLeaf("x", "a page", "x", "Firefox")
+        self.emacs = MockLeaf("x", "foo [bar] baz", "x", "Emacs")
+        self.mi3 = MockI3(MockWorkspace(1, self.firefox, self.emacs))
+        self.rename = build_rename(self.mi3, mappings, {}, AttrDict(base_config()))
+        self.cache = self.rename.label_cache
+        self.rename(self.mi3)
+        del self.mi3.cmd
+
+    def title(self, leaf, title):
+        leaf.name = leaf.window_title = title
+        self.rename(self.mi3, AttrDict(change="title", container=leaf))
+
+    def test_title_independent_label(self):
+        self.title(self.firefox, "firefox")
+        self.assertFalse(hasattr(self.mi3, "cmd"))
+        self.assertEqual((1, 2), (self.cache.short_circuits, self.cache.misses))
+
+    def test_transformed_title(self):
+        self.title(self.emacs, "foo [qux] baz")
+        self.assertListEqual(["1: \uf269|qux"], get_names(self.mi3.cmd))
+        self.assertEqual(0, self.cache.short_circuits)
+
+    def test_reload_scoping_title(self):
+        mappings = {
+            "page": "globe",
+            "firefox": {"icon": "firefox", "match_on": "window_class"},
+        }
+        # the titles matter to every label now
+        self.assertEqual(2, self.rename.reload(mappings, {}))
+        self.rename(self.mi3)
+        self.title(self.firefox, "page two")
+        self.assertEqual(0, self.cache.short_circuits)
+        self.assertListEqual(["1: \uf0ac|Emacs"], get_names(self.mi3.cmd))
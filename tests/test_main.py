@@ -2,7 +2,7 @@ import sys
 from unittest.mock import patch
 
 from i3_workspace_names_daemon import main
-from mocks import AttrDict, MockLeaf, MockWorkspace, MockTree, MockI3
+from mocks import AttrDict, MockLeaf, MockWorkspace, MockTree, MockI3, MockAsyncI3
 from pytest import raises
 import i3ipc
 
@@ -37,3 +37,141 @@ def test_config(monkeypatch):
     with raises(SystemExit) as ex:
         main()
     assert "Specified app-icon config path 'asd' does not exist" in str(ex)
+
+
+@patch.object(sys, 'argv', ['i3_workspace_names_daemon', '--async', '-v', '-c', 'tests/test-config.json'])
+def test_main_async(monkeypatch, capsys):
+    import i3ipc.aio
+    monkeypatch.setattr(i3ipc.aio, 'Connection', lambda: MockAsyncI3(
+        MockWorkspace(1, MockLeaf("firefox")),
+    ))
+    main()
+    cap = capsys.readouterr()
+    assert '-> name: firefox' in cap.out
+    assert 'rename workspace "" to "1: "' in cap.out
+
+
+def test_background_commands(monkeypatch):
+    import threading
+    import time
+    from mocks import FakeI3Server
+    monkeypatch.setattr(sys, 'argv', [
+        'i3_workspace_names_daemon', '--ipc', 'builtin', '--background-commands', '-c', 'tests/test-config.json',
+    ])
+    with FakeI3Server(MockWorkspace(1, MockLeaf("firefox"))) as server:
+        monkeypatch.setenv('I3SOCK', server.path)
+
+        def shutdown():
+            server.subscribed.wait(5)
+            deadline = time.monotonic() + 5
+            while not server.commands and time.monotonic() < deadline:
+                time.sleep(0.01)
+            server.emit('shutdown', {'change': 'exit'})
+
+        threading.Thread(target=shutdown, daemon=True).start()
+        main()
+        assert server.commands == ['rename workspace "" to "1: "']
+        # the commands are sent apart from the requests and the events
+        assert len(server._connections) == 3
+
+
+@patch.object(sys, 'argv', ['i3_workspace_names_daemon', '--ipc', 'builtin', '-c', 'tests/test-config.json'])
+def test_main_builtin_ipc(monkeypatch):
+    import threading
+    from mocks import FakeI3Server
+    with FakeI3Server(MockWorkspace(1, MockLeaf("firefox"))) as server:
+        monkeypatch.setenv('I3SOCK', server.path)
+
+        def shutdown():
+            server.subscribed.wait(5)
+            server.emit('shutdown', {'change': 'exit'})
+
+        threading.Thread(target=shutdown, daemon=True).start()
+        main()
+        assert server.commands == ['rename workspace "" to "1: "']
+
+
+@patch.object(sys, 'argv', ['i3_workspace_names_daemon', '--ipc', 'builtin', '-c', 'tests/test-config.json'])
+def test_record_replay(monkeypatch, tmp_path, capsys):
+    import io
+    import random
+    import threading
+    import i3_workspace_names_daemon
+    from mocks import FakeI3Server
+    trace = str(tmp_path / 'trace.gz')
+    with FakeI3Server(MockWorkspace(1, MockLeaf("firefox")), MockWorkspace(2)) as server:
+        monkeypatch.setenv('I3SOCK', server.path)
+        monkeypatch.setattr(sys, 'argv', sys.argv + ['--record', trace])
+
+        def changes():
+            server.subscribed.wait(5)
+            rng = random.Random(1)
+            for change in (server.open_window, server.retitle, server.move, server.open_window):
+                change(rng)
+            server.emit('shutdown', {'change': 'exit'})
+
+        threading.Thread(target=changes, daemon=True).start()
+        main()
+    recorded = server.commands
+    assert len(recorded) > 1
+    capsys.readouterr()
+    for ipc in ('i3ipc', 'builtin'):
+        monkeypatch.setattr(sys, 'argv', [
+            'i3_workspace_names_daemon', '--ipc', ipc, '-c', 'tests/test-config.json', '--replay', trace,
+        ])
+        monkeypatch.setattr('i3_workspace_names_daemon.stderr', io.StringIO())
+        main()
+        assert capsys.readouterr().out.splitlines() == recorded
+        assert 'replayed 4 events' in i3_workspace_names_daemon.stderr.getvalue()
+
+
+def test_offline(monkeypatch, tmp_path, capsys):
+    import io
+    import i3_workspace_names_daemon
+    from mocks import tree_reply
+    first = tmp_path / 'first.json'
+    first.write_text(tree_reply([MockWorkspace(1, MockLeaf("firefox")), MockWorkspace(2)]))
+    renamed = MockWorkspace(1, MockLeaf("chromium-browser"))
+    renamed.name = "1: "
+    monkeypatch.setattr('i3_workspace_names_daemon.stdin', io.StringIO(tree_reply([renamed])))
+    monkeypatch.setattr('i3_workspace_names_daemon.stderr', io.StringIO())
+    for ipc in ('i3ipc', 'builtin'):
+        monkeypatch.setattr(sys, 'argv', [
+            'i3_workspace_names_daemon', '--ipc', ipc, '-c', 'tests/test-config.json',
+            '--offline', str(first), '-',
+        ])
+        main()
+        assert capsys.readouterr().out.splitlines() == [
+            '# {}'.format(first),
+            'rename workspace "" to "1: "',
+            'rename workspace "" to "2"',
+            '# -',
+        ]
+        i3_workspace_names_daemon.stdin.seek(0)
+    assert '2 trees, 3 workspaces, 2 windows' in i3_workspace_names_daemon.stderr.getvalue()
+
+
+def test_evaluate(monkeypatch, tmp_path):
+    import io
+    import json
+    import i3_workspace_names_daemon
+    corpus = tmp_path / 'corpus.jsonl'
+    corpus.write_text('\n'.join(json.dumps(row) for row in (
+        {"name": "firefox", "window_class": "firefox"},
+        {"window_class": "mpv"},
+        {"name": "Firefox - a page"},
+    )) + '\n')
+    monkeypatch.setattr(sys, 'argv', [
+        'i3_workspace_names_daemon', '-c', 'tests/test-config.json', '--evaluate', str(corpus),
+    ])
+    monkeypatch.setattr('i3_workspace_names_daemon.stdout', io.StringIO())
+    monkeypatch.setattr('i3_workspace_names_daemon.stderr', io.StringIO())
+    main()
+    rows = [json.loads(line) for line in i3_workspace_names_daemon.stdout.getvalue().splitlines()]
+    assert [row['rule'] for row in rows] == ['firefox', None, 'firefox']
+    assert rows[1]['label'] == 'mpv'
+    report = i3_workspace_names_daemon.stderr.getvalue()
+    assert '3 windows in' in report
+    assert 'no rule matched 1 windows' in report
+    assert '  chromium-browser\n' in report
+    assert '  vlc\n' in report
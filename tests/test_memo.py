@@ -0,0 +1,57 @@
+import unittest
+from mocks import AttrDict, MockLeaf, MockWorkspace, MockI3
+
+from i3_workspace_names_daemon import LRUMemo, build_rename
+from test_rename import base_config, base_mappings
+
+
+class TestLRUMemo(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.memo = LRUMemo(lambda *key: self.calls.append(key) or len(self.calls), maxsize=2)
+
+    def test_hit(self):
+        self.assertEqual(1, self.memo("a", 1))
+        self.assertEqual(1, self.memo("a", 1))
+        self.assertEqual(2, self.memo("a", 2))
+        self.assertEqual([("a", 1), ("a", 2)], self.calls)
+        self.assertEqual((1, 2), (self.memo.hits, self.memo.misses))
+
+    def test_least_recently_used_evicted(self):
+        self.memo("a")
+        self.memo("b")
+        self.memo("a")
+        self.memo("c")
+        self.assertEqual(1, self.memo.evictions)
+        self.assertEqual(1, self.memo("a"))
+        self.assertEqual(4, self.memo("b"))
+
+    def test_disabled(self):
+        memo = LRUMemo(lambda key: key, maxsize=0)
+        memo("a")
+        memo("a")
+        self.assertEqual((0, 2, 0), (memo.hits, memo.misses, len(memo)))
+
+
+class TestTitleMemo(unittest.TestCase):
+    def setUp(self):
+        mappings = base_mappings()
+        mappings["emacs"] = {"transform_title": {"from": r".*\[(.+?)\].*", "to": r"\1", "compress": True}}
+        self.emacs = MockLeaf("emacs", "foo [i3-workspace-names]")
+        self.mi3 = MockI3(MockWorkspace(1, self.emacs))
+        self.rename = build_rename(self.mi3, mappings, {}, AttrDict(base_config()))
+
+    def test_title_seen_before(self):
+        self.rename(self.mi3)
+        self.emacs.window_title = "foo [other]"
+        self.rename(self.mi3)
+        self.emacs.window_title = "foo [i3-workspace-names]"
+        self.rename(self.mi3)
+        self.assertEqual('rename workspace "" to "1: i3-wor-nam"', self.mi3.cmd)
+        memo = self.rename.labeller.title_memo
+        self.assertEqual((1, 2), (memo.hits, memo.misses))
+
+    def test_cleared_on_reload(self):
+        self.rename(self.mi3)
+        self.rename.reload(base_mappings(), {})
+        self.assertEqual(0, len(self.rename.labeller.title_memo))
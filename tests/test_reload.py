@@ -0,0 +1,111 @@
+import json
+import os
+import re
+import tempfile
+import unittest
+from mocks import AttrDict, MockLeaf, MockWorkspace, MockI3
+
+from i3_workspace_names_daemon import build_rename, _changed_keys, _reload_config
+from test_rename import base_config, base_mappings, get_names
+
+
+class TestChangedKeys(unittest.TestCase):
+    def test_changed_added_removed(self):
+        old = {"a": "x", "b": "y", "c": "z"}
+        new = {"a": "x", "b": "w", "d": "z"}
+        self.assertEqual({"b", "c", "d"}, _changed_keys(old, new))
+
+    def test_reordered(self):
+        self.assertIsNone(_changed_keys({"a": "x", "b": "y"}, {"b": "y", "a": "x"}))
+
+
+class TestReload(unittest.TestCase):
+    def setUp(self):
+        self.firefox = MockLeaf("firefox")
+        self.chromium = MockLeaf("chromium-browser")
+        self.mi3 = MockI3(MockWorkspace(1, self.firefox, self.chromium))
+        self.rename = build_rename(self.mi3, base_mappings(), {}, AttrDict(base_config()))
+        self.rename(self.mi3)
+        self.cache = self.rename.label_cache
+
+    def test_only_affected_labels_dropped(self):
+        mappings = base_mappings()
+        mappings["firefox"] = "globe"
+        self.assertEqual(1, self.rename.reload(mappings, {}))
+        self.rename(self.mi3)
+        self.assertListEqual(["1: \uf0ac|\uf268"], get_names(self.mi3.cmd))
+        self.assertEqual((1, 3), (self.cache.hits, self.cache.misses))
+
+    def test_unchanged_rules_reused(self):
+        rule = self.rename.labeller.rules.rules[0]
+        mappings = base_mappings()
+        mappings["firefox"] = "globe"
+        self.rename.reload(mappings, {})
+        self.assertIs(rule, self.rename.labeller.rules.rules[0])
+
+    def test_unchanged_patterns_reused(self):
+        # the backreference splits the regex keys into two joined patterns
+        mappings = {"fire.*": "firefox", "chrom.*": "chrome", r"(x)\1": "globe", "vl.*": "play", "mp.*": "play"}
+        self.rename.reload(mappings, {})
+        patterns = dict(self.rename.labeller.rules.patterns)
+        self.assertEqual(3, len(patterns))
+        mappings["vl.*"] = "globe"
+        mappings["mpv.*"] = mappings.pop("mp.*")
+        self.rename.reload(mappings, {})
+        reloaded = self.rename.labeller.rules.patterns
+        self.assertIs(patterns[("fire.*", "chrom.*")], reloaded[("fire.*", "chrom.*")])
+        self.assertIs(patterns[(r"(x)\1",)], reloaded[(r"(x)\1",)])
+        self.assertNotIn(("vl.*", "mp.*"), reloaded)
+        self.assertEqual(4, self.rename.labeller.rules.match("mpv"))  # "mpv.*" moved to the end
+
+    def test_new_key_drops_labels_it_matches(self):
+        mappings = {"chromium": "globe"}
+        mappings.update(base_mappings())
+        self.assertEqual(1, self.rename.reload(mappings, {}))
+        self.rename(self.mi3)
+        self.assertListEqual(["1: \uf269|\uf0ac"], get_names(self.mi3.cmd))
+
+    def test_no_match_change_drops_all(self):
+        mappings = base_mappings()
+        mappings["_no_match"] = "question"
+        self.assertEqual(2, self.rename.reload(mappings, {}))
+
+    def test_fixed_workspaces(self):
+        self.rename.reload(base_mappings(), {1: {"icon": "globe", "name": "web"}})
+        self.rename(self.mi3)
+        self.assertListEqual(["1: \uf0ac web"], get_names(self.mi3.cmd))
+
+    def test_invalid_key_keeps_rules(self):
+        rules = self.rename.labeller.rules
+        with self.assertRaises(re.error):
+            self.rename.reload({"fire(fox": "globe"}, {})
+        self.assertIs(rules, self.rename.labeller.rules)
+        self.assertEqual(2, len(self.cache))
+
+
+class TestReloadConfig(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.args = AttrDict(base_config(), config_path=self.path, bypass_validation=False)
+        self.args.verbose = False
+        self.mi3 = MockI3(MockWorkspace(1, MockLeaf("firefox")))
+        self.rename = build_rename(self.mi3, base_mappings(), {}, self.args)
+
+    def write(self, config):
+        with open(self.path, "w") as f:
+            f.write(config if isinstance(config, str) else json.dumps(config))
+
+    def test_reload(self):
+        self.write({"firefox": "globe", "1": "terminal"})
+        self.assertTrue(_reload_config(self.rename, self.args))
+        self.rename(self.mi3)
+        self.assertListEqual(["1: \uf120"], get_names(self.mi3.cmd))
+
+    def test_invalid_config_keeps_previous(self):
+        for config in ({"firefox": "no-such-icon"}, "{not json", {"fire(fox": "globe"}):
+            self.write(config)
+            self.assertFalse(_reload_config(self.rename, self.args))
+        self.rename(self.mi3)
+        self.assertListEqual(["1: \uf269"], get_names(self.mi3.cmd))
@@ -428,3 +428,20 @@ class TestRename(unittest.TestCase):
         expected = ['1: ']
         actual = get_names(mi3.cmd)
         self.assertListEqual(expected, actual)
+
+    def test_match_on(self):
+        mappings = {"code": {"icon": "file-pen", "match_on": ["window_class"]}}
+        mappings.update(base_mappings())
+        args = AttrDict(base_config())
+
+        mi3 = MockI3(
+            MockWorkspace(1, MockLeaf("firefox", "code review")),
+            MockWorkspace(2, MockLeaf("x", "x", "x", "Code")),
+        )
+
+        rename = build_rename(mi3, mappings, {}, args)
+        rename(mi3)
+
+        expected = ["1: \uf269", "2: \uf31c"]
+        actual = get_names(mi3.cmd)
+        self.assertListEqual(expected, actual)
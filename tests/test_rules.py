@@ -0,0 +1,193 @@
+import re
+import unittest
+
+from i3_workspace_names_daemon import RuleSet, _required_prefix, _shadowed_rules
+
+
+def first_match(mappings, name):
+    # reference semantics: the loop RuleSet replaces
+    for index, name_re in enumerate(mappings):
+        if re.match(name_re, name, re.IGNORECASE):
+            return index
+    return None
+
+
+class TestRuleSet(unittest.TestCase):
+    def test_no_rules(self):
+        rules = RuleSet({})
+        self.assertIsNone(rules.match("firefox"))
+
+    def test_first_match_wins(self):
+        rules = RuleSet({"fire": "a", "firefox": "b"})
+        self.assertEqual(0, rules.match("firefox"))
+
+    def test_case_insensitive(self):
+        rules = RuleSet({"signal": "comment"})
+        self.assertEqual(0, rules.match("Signal"))
+
+    def test_inner_groups(self):
+        rules = RuleSet({"(a)(b)c": "x", "(ab)(d)": "y", "abe": "z"})
+        self.assertEqual(1, rules.match("abd"))
+        self.assertEqual(2, rules.match("abe"))
+
+    def test_unsharable_keys_keep_order(self):
+        mappings = {
+            "foo": "a",
+            r"(x)\1": "b",
+            "(?i)xx.*": "c",
+            "x": "d",
+            "(?P<n>y)(?P=n)": "e",
+            "y": "f",
+            "fire fox.*": "g",
+        }
+        try:
+            re.compile("z(?x)")
+        except re.error:
+            # global flags must come first since Python 3.11
+            pass
+        else:
+            # a verbose flag in the middle of a key applies to the whole pattern
+            mappings["z(?x)"] = "h"
+        mappings["bar"] = "i"
+        rules = RuleSet(mappings)
+        for name in ("foo", "xx", "xxyy", "xa", "yy", "ya", "zzz", "firefox", "fire fox", "bar"):
+            self.assertEqual(first_match(mappings, name), rules.match(name), name)
+
+    def test_literal_and_regex_order(self):
+        mappings = {
+            "fire.*fox": "a",
+            "firefox$": "b",
+            "fire": "c",
+            "^firefox-esr$": "d",
+            r"firefox\-": "e",
+            "f": "f",
+        }
+        rules = RuleSet(mappings)
+        for name in ("Firefox", "firefox-esr", "fire", "firefox\n", "f", "fx", "g", "F\u0130refox"):
+            self.assertEqual(first_match(mappings, name), rules.match(name), name)
+
+    def test_duplicate_literal_keys(self):
+        rules = RuleSet({"Signal": "a", "signal": "b"})
+        self.assertEqual(0, rules.match("signal"))
+
+    def test_empty_key_matches_everything(self):
+        rules = RuleSet({".*x": "a", "": "b"})
+        self.assertEqual(0, rules.match("abx"))
+        self.assertEqual(1, rules.match("abc"))
+
+    def test_non_ascii_name(self):
+        # "K" (kelvin sign) matches "k" under IGNORECASE
+        mappings = {"kitty": "a"}
+        rules = RuleSet(mappings)
+        self.assertEqual(first_match(mappings, "\u212aitty"), rules.match("\u212aitty"))
+
+    def test_compiled_rules(self):
+        rules = RuleSet({
+            "firefox": "firefox",
+            "emacs": {"transform_title": {"from": r".*\[(.+?)\].*", "to": r"\1", "compress": True}},
+            "vlc": {"icon": "play"},
+            "foo": "does-not-exist",
+            "bar": "<b>bar</b>",
+        }).rules
+        self.assertEqual("\uf269", rules[0].icon)
+        self.assertIsNone(rules[0].transform)
+        self.assertIsNone(rules[1].icon)
+        self.assertEqual("bar", rules[1].transform.sub(rules[1].transform_to, "[bar] baz"))
+        self.assertEqual("window_title", rules[1].transform_on)
+        self.assertTrue(rules[1].compress)
+        self.assertEqual("\uf04b", rules[2].icon)
+        self.assertIsNone(rules[3].icon)
+        self.assertEqual("<b>bar</b>", rules[4].icon)
+
+
+class TestMatchOn(unittest.TestCase):
+    def setUp(self):
+        self.rules = RuleSet({
+            "code": {"icon": "file-pen", "match_on": ["window_class"]},
+            "mail": {"icon": "envelope", "match_on": "window_title"},
+            "term": "terminal",
+        })
+
+    def test_scoped(self):
+        self.assertEqual(0, self.rules.match("code", "window_class"))
+        self.assertIsNone(self.rules.match("code", "window_title"))
+        self.assertEqual(1, self.rules.match("mail", "window_title"))
+        self.assertIsNone(self.rules.match("mail", "window_class"))
+
+    def test_unscoped_apply_everywhere(self):
+        for identifier in (None, "name", "window_title", "window_class", "app_id"):
+            self.assertEqual(2, self.rules.match("term", identifier))
+
+    def test_without_identifier_all_rules(self):
+        self.assertEqual(0, self.rules.match("code"))
+
+    def test_order_kept_within_scope(self):
+        rules = RuleSet({
+            "fire": {"icon": "a", "match_on": ["app_id"]},
+            "firefox": "b",
+            "f.*": {"icon": "c", "match_on": ["window_class"]},
+        })
+        self.assertEqual(0, rules.match("firefox", "app_id"))
+        self.assertEqual(1, rules.match("firefox", "window_class"))
+        self.assertEqual(2, rules.match("fx", "window_class"))
+        self.assertIsNone(rules.match("fx", "name"))
+
+
+class TestRuleProfile(unittest.TestCase):
+    def setUp(self):
+        self.mappings = {
+            "fire": {"icon": "a", "match_on": "window_class"},
+            "chrom.*": "b",
+            "vlc$": "c",
+        }
+        self.rules = RuleSet(self.mappings)
+        self.rules.enable_profile()
+
+    def test_same_matches(self):
+        indexed = RuleSet(self.mappings)
+        for name in ("firefox", "chromium", "vlc", "VLC", "mpv"):
+            for identifier in (None, "name", "window_class"):
+                self.assertEqual(indexed.match(name, identifier), self.rules.match(name, identifier))
+
+    def test_counts(self):
+        self.rules.match("vlc", "name")
+        self.rules.match("chromium", "name")
+        self.rules.match("firefox", "window_class")
+        profile = self.rules.profile
+        self.assertEqual([1, 2, 1], profile.attempts)
+        self.assertEqual([1, 1, 1], profile.hits)
+        self.assertEqual(
+            ["chrom.*", "fire", "vlc$"], sorted(entry["rule"] for entry in profile.as_dict())
+        )
+
+
+class TestShadowedRules(unittest.TestCase):
+    def test_required_prefix(self):
+        self.assertEqual("firefox", _required_prefix("^FireFox$"))
+        self.assertEqual("fire", _required_prefix("fire.*dev"))
+        self.assertEqual("firefo", _required_prefix("firefox?"))
+        self.assertEqual("firefox", _required_prefix("firefox+"))
+        self.assertEqual("", _required_prefix("fire|ice"))
+        self.assertEqual("ab", _required_prefix("ab[|]cd"))
+        self.assertEqual("", _required_prefix(r"\d+"))
+
+    def test_shadowed(self):
+        self.assertEqual(
+            [("firefox$", "fire"), ("firefox.*dev", "fire"), ("VLC$", "vlc$")],
+            _shadowed_rules({
+                "fire": "a",
+                "firefox$": "b",
+                "firefox.*dev": "c",
+                "ice|fire": "d",
+                "vlc$": "e",
+                "VLC$": "f",
+                "vlc-remote": "g",
+            }),
+        )
+
+    def test_scopes(self):
+        self.assertEqual([("^code$", "code")], _shadowed_rules({
+            "code": {"icon": "a", "match_on": "window_class"},
+            "codex": "b",
+            "^code$": {"icon": "c", "match_on": ["window_class"]},
+        }))
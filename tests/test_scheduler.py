@@ -0,0 +1,84 @@
+import threading
+import unittest
+from mocks import AttrDict, MockLeaf, MockWorkspace, MockI3
+
+from i3_workspace_names_daemon import RenameScheduler, build_rename
+from test_rename import base_config, base_mappings
+
+
+class FakeTimer:
+    """Timer that only fires when the test says so."""
+
+    started = []
+
+    def __init__(self, interval, function, args=()):
+        self.function = function
+        self.args = args
+        self.cancelled = False
+
+    def start(self):
+        FakeTimer.started.append(self)
+
+    def cancel(self):
+        self.cancelled = True
+
+    @classmethod
+    def fire(cls):
+        timer = cls.started.pop(0)
+        timer.function(*timer.args)
+
+
+class TestRenameScheduler(unittest.TestCase):
+    def setUp(self):
+        FakeTimer.started = []
+        self.calls = []
+        self.scheduler = RenameScheduler(
+            self.calls.append, 0.05, threading.RLock(), timer=FakeTimer
+        )
+
+    def test_leading_edge(self):
+        self.scheduler.submit("new")
+        self.assertListEqual(["new"], self.calls)
+        FakeTimer.fire()
+        self.assertListEqual(["new"], self.calls)
+        self.assertListEqual([], FakeTimer.started)
+
+    def test_burst_coalesced(self):
+        for i in range(20):
+            self.scheduler.submit(i)
+        self.assertListEqual([0], self.calls)
+        FakeTimer.fire()
+        self.assertListEqual([0, 19], self.calls)
+        FakeTimer.fire()
+        self.assertListEqual([0, 19], self.calls)
+        self.assertEqual((20, 2), (self.scheduler.submitted, self.scheduler.runs))
+
+    def test_title_waits_for_trailing_edge(self):
+        self.scheduler.submit("title", structural=False)
+        self.assertListEqual([], self.calls)
+        FakeTimer.fire()
+        self.assertListEqual(["title"], self.calls)
+
+    def test_structural_overtakes_titles(self):
+        self.scheduler.submit("title", structural=False)
+        self.scheduler.submit("new")
+        self.assertListEqual(["new"], self.calls)
+        # the cancelled window must not run anything
+        FakeTimer.fire()
+        FakeTimer.fire()
+        self.assertListEqual(["new"], self.calls)
+
+
+class TestDebouncedRename(unittest.TestCase):
+    def test_rename_through_scheduler(self):
+        FakeTimer.started = []
+        args = AttrDict(base_config())
+        args.debounce_ms = 50
+        mi3 = MockI3(MockWorkspace(1, MockLeaf("firefox")))
+        rename = build_rename(mi3, base_mappings(), {}, args)
+        rename.scheduler._timer_factory = FakeTimer
+        rename(mi3, AttrDict(change="new", container=MockLeaf("firefox")))
+        rename(mi3, AttrDict(change="new", container=MockLeaf("firefox")))
+        self.assertEqual(1, rename.scheduler.runs)
+        FakeTimer.fire()
+        self.assertEqual(2, rename.scheduler.runs)
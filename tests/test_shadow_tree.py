@@ -0,0 +1,78 @@
+import unittest
+from mocks import AttrDict, MockLeaf, MockWorkspace, MockI3
+
+from i3_workspace_names_daemon import build_rename
+from test_rename import base_config, base_mappings, get_names
+
+
+def window_event(change, leaf):
+    return AttrDict(change=change, container=leaf)
+
+
+def workspace_event(change, workspace):
+    return AttrDict(change=change, current=workspace)
+
+
+class TestShadowTree(unittest.TestCase):
+    def setUp(self):
+        mappings = base_mappings()
+        mappings["emacs"] = {"transform_title": {"from": r".*\[(.+?)\].*", "to": r"\1"}}
+        self.firefox = MockLeaf("firefox")
+        self.emacs = MockLeaf("emacs", "foo [bar] baz")
+        self.ws1 = MockWorkspace(1, self.firefox)
+        self.ws2 = MockWorkspace(2, self.emacs)
+        self.mi3 = MockI3(self.ws1, self.ws2)
+        args = AttrDict(base_config())
+        args.shadow_tree = True
+        self.rename = build_rename(self.mi3, mappings, {}, args)
+        self.rename(self.mi3)
+
+    def test_startup_syncs(self):
+        self.assertEqual(1, self.mi3.get_tree_calls)
+        self.assertListEqual(["1: \uf269", "2: bar"], get_names(self.mi3.cmd))
+
+    def test_close_without_tree(self):
+        self.rename(self.mi3, window_event("close", self.firefox))
+        self.assertEqual(1, self.mi3.get_tree_calls)
+        self.assertEqual('rename workspace "1: \uf269" to "1"', self.mi3.cmd)
+
+    def test_title_without_tree(self):
+        self.emacs.window_title = "foo [qux] baz"
+        self.rename(self.mi3, window_event("title", self.emacs))
+        self.assertEqual(1, self.mi3.get_tree_calls)
+        self.assertEqual('rename workspace "2: bar" to "2: qux"', self.mi3.cmd)
+
+    def test_new_window_syncs(self):
+        self.ws1.leaves_ = (self.firefox, MockLeaf("chromium-browser"))
+        self.rename(self.mi3, window_event("new", self.ws1.leaves_[1]))
+        self.assertEqual(2, self.mi3.get_tree_calls)
+        self.assertIn('to "1: \uf269|\uf268"', self.mi3.cmd)
+
+    def test_workspace_init_without_tree(self):
+        self.rename(self.mi3, workspace_event("init", MockWorkspace(3)))
+        self.assertEqual(1, self.mi3.get_tree_calls)
+        self.assertEqual('rename workspace "" to "3"', self.mi3.cmd)
+
+    def test_workspace_rename_tracked(self):
+        self.ws1.name = "1: web"
+        self.rename(self.mi3, workspace_event("rename", self.ws1))
+        self.rename(self.mi3, window_event("close", self.firefox))
+        self.assertEqual('rename workspace "1: web" to "1"', self.mi3.cmd)
+
+    def test_periodic_resync(self):
+        self.rename.shadow.resync_interval = 0
+        self.rename(self.mi3, window_event("close", self.firefox))
+        self.assertEqual(2, self.mi3.get_tree_calls)
+
+    def test_unchanged_close_sends_nothing(self):
+        second = MockLeaf("firefox")
+        mi3 = MockI3(MockWorkspace(1, self.firefox, second))
+        args = AttrDict(base_config())
+        args.shadow_tree = True
+        args.uniq = True
+        rename = build_rename(mi3, base_mappings(), {}, args)
+        rename(mi3)
+        del mi3.cmd
+        rename(mi3, window_event("close", second))
+        self.assertEqual(1, mi3.get_tree_calls)
+        self.assertFalse(hasattr(mi3, "cmd"))
@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from mocks import AttrDict, MockLeaf, MockWorkspace, MockI3
+
+from i3_workspace_names_daemon import Histogram, Stats, build_rename
+from test_rename import base_config, base_mappings
+
+
+class TestHistogram(unittest.TestCase):
+    def test_empty(self):
+        self.assertDictEqual(
+            {"count": 0, "mean_us": 0, "max_us": 0, "p50_us": 0, "p90_us": 0, "p99_us": 0},
+            Histogram().as_dict(),
+        )
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        for _ in range(9):
+            histogram.add(0.000003)
+        histogram.add(0.001)
+        self.assertEqual(4, histogram.percentile(50))
+        self.assertEqual(4, histogram.percentile(90))
+        self.assertEqual(1024, histogram.percentile(99))
+        self.assertEqual(1000.0, histogram.as_dict()["max_us"])
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        self.firefox = MockLeaf("firefox")
+        self.mi3 = MockI3(MockWorkspace(1, self.firefox), MockWorkspace(2))
+        args = AttrDict(base_config())
+        args.stats = True
+        self.rename = build_rename(self.mi3, base_mappings(), {}, args)
+
+    def test_disabled_by_default(self):
+        rename = build_rename(self.mi3, base_mappings(), {}, AttrDict(base_config()))
+        self.assertIsNone(rename.stats)
+
+    def test_counts(self):
+        self.rename(self.mi3)
+        self.rename(self.mi3, AttrDict(change="title", container=self.firefox))
+        self.rename(self.mi3, AttrDict(change="new", container=self.firefox))
+        stats = self.rename.stats.as_dict()
+        self.assertDictEqual({"startup": 1, "window::title": 1, "window::new": 1}, stats["events"])
+        self.assertDictEqual({"window::title": 1}, stats["events_skipped"])
+        self.assertEqual(2, stats["passes"])
+        # the mock never applies the renames, so they are sent again
+        self.assertEqual(4, stats["renames"])
+        self.assertEqual(0, stats["workspaces_unchanged"])
+        for histogram in ("event_latency", "get_tree", "labels", "command"):
+            self.assertEqual(2, stats[histogram]["count"], histogram)
+        self.assertDictEqual(
+            {"size": 1, "hits": 1, "misses": 1, "short_circuits": 1}, stats["caches"]["labels"]
+        )
+
+    def test_profile_rules(self):
+        args = AttrDict(base_config())
+        args.profile_rules = True
+        rename = build_rename(self.mi3, base_mappings(), {}, args)
+        rename(self.mi3)
+        rules = rename.stats.as_dict()["rules"]
+        self.assertSetEqual(set(base_mappings()), {entry["rule"] for entry in rules})
+        self.assertEqual(1, sum(entry["hits"] for entry in rules))
+        self.assertTrue(all(entry["attempts"] >= entry["hits"] for entry in rules))
+
+    def test_no_profile_by_default(self):
+        self.rename(self.mi3)
+        self.assertIsNone(self.rename.stats.as_dict()["rules"])
+
+    def test_dump_to_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stats.json")
+            stats = Stats(path, interval=0)
+            stats.count_pass()
+            with open(path) as f:
+                self.assertEqual(1, json.load(f)["passes"])
+            self.assertListEqual(["stats.json"], os.listdir(tmp))
+
+    def test_dump_from_threads(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stats.json")
+            stats = Stats(path, interval=0)
+            errors = []
+
+            def count():
+                try:
+                    for _ in range(200):
+                        stats.count_pass(time.perf_counter())
+                except Exception as e:  # pragma: no cover
+                    errors.append(e)
+
+            threads = [threading.Thread(target=count) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual([], errors)
+            self.assertEqual(800, stats.as_dict()["passes"])
+            self.assertEqual(800, stats.as_dict()["event_latency"]["count"])
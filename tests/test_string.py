@@ -51,3 +51,12 @@ class TestString(unittest.TestCase):
         expected = "i3-wor-nam-dae"
         actual = compress(original)
         self.assertEqual(expected, actual)
+
+    def test_compress_length(self):
+        original = "i3-workspace names/daemon"
+        self.assertEqual("i-w n/d", compress(original, 1))
+        self.assertEqual("- /", compress(original, 0))
+
+    def test_compress_long(self):
+        original = "i3-workspace-names-daemon " * 1000
+        self.assertEqual("i3-wor-nam-dae " * 999 + "i3-wor-nam-dae", compress(original))
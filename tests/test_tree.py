@@ -0,0 +1,96 @@
+import asyncio
+import json
+import sys
+import unittest
+from unittest.mock import patch
+import i3ipc
+from mocks import AttrDict, MockAsyncI3, MockLeaf, MockWorkspace, MockI3, tree_reply
+
+from i3_workspace_names_daemon import (
+    WINDOW_IDENTIFIERS, _raw_tree_request, build_async_rename, build_rename, parse_tree, TreeWindow,
+)
+from test_rename import base_config, base_mappings, get_names
+
+
+def describe(tree):
+    return [
+        (ws.id, ws.num, ws.name, [
+            (leaf.id,) + tuple(getattr(leaf, attr, None) for attr in WINDOW_IDENTIFIERS)
+            for leaf in ws.leaves()
+        ])
+        for ws in tree.workspaces()
+    ]
+
+
+class TestParseTree(unittest.TestCase):
+    def setUp(self):
+        self.workspaces = (
+            MockWorkspace(1, MockLeaf("firefox"), MockLeaf("emacs", "foo [bar]")),
+            MockWorkspace(2),
+            MockWorkspace(3, MockLeaf("x-terminal-emulator", instance="urxvt", wc="URxvt")),
+        )
+
+    def test_same_as_i3ipc(self):
+        data = tree_reply(self.workspaces)
+        expected = describe(i3ipc.Con(json.loads(data), None, None))
+        self.assertEqual(expected, describe(parse_tree(data)))
+        self.assertEqual(expected, describe(parse_tree(data.encode())))
+        # the bar in the dockarea is no leaf
+        self.assertEqual(
+            [leaf.id for leaf in i3ipc.Con(json.loads(data), None, None).leaves()],
+            [leaf.id for leaf in parse_tree(data).leaves()],
+        )
+
+    def test_floating_after_tiling(self):
+        tree = json.loads(tree_reply(self.workspaces[:1]))
+        workspace = tree["nodes"][1]["nodes"][1]["nodes"][0]
+        floating = workspace["nodes"].pop(0)
+        workspace["floating_nodes"] = [dict(floating, type="floating_con", nodes=[floating])]
+        data = json.dumps(tree)
+        expected = describe(i3ipc.Con(json.loads(data), None, None))
+        self.assertEqual(expected, describe(parse_tree(data)))
+        self.assertEqual(["emacs", "firefox"], [leaf.name for leaf in parse_tree(data).leaves()])
+
+    def test_geometry_dropped(self):
+        leaf = parse_tree(tree_reply(self.workspaces)).workspaces()[0].leaves()[0]
+        self.assertIs(TreeWindow, type(leaf))
+        self.assertFalse(hasattr(leaf, "rect"))
+
+
+class TestLeanTreeRename(unittest.TestCase):
+    def setUp(self):
+        self.mi3 = MockI3(
+            MockWorkspace(1, MockLeaf("firefox"), MockLeaf("chromium-browser")),
+            MockWorkspace(2, MockLeaf(None, "myprogram")),
+        )
+
+    def test_rename(self):
+        args = AttrDict(base_config(), lean_tree=True)
+        build_rename(self.mi3, base_mappings(), {}, args)(self.mi3)
+        self.assertListEqual(["1: \uf269|\uf268", "2: ?"], get_names(self.mi3.cmd))
+
+    def test_without_raw_request(self):
+        # the private module of i3ipc went away
+        with patch.dict(sys.modules, {"i3ipc._private": None}):
+            self.assertIsNone(_raw_tree_request(self.mi3))
+            args = AttrDict(base_config(), lean_tree=True)
+            build_rename(self.mi3, base_mappings(), {}, args)(self.mi3)
+        self.assertListEqual(["1: \uf269|\uf268", "2: ?"], get_names(self.mi3.cmd))
+
+    def test_shadow_tree(self):
+        args = AttrDict(base_config(), lean_tree=True, shadow_tree=True)
+        rename = build_rename(self.mi3, base_mappings(), {}, args)
+        rename(self.mi3)
+        self.assertEqual(3, len(rename.shadow.windows))
+        self.assertListEqual(["1: \uf269|\uf268", "2: ?"], get_names(self.mi3.cmd))
+
+    def test_async(self):
+        mi3 = MockAsyncI3(*self.mi3.workspaces)
+
+        async def run():
+            rename = build_async_rename(mi3, base_mappings(), {}, AttrDict(base_config(), lean_tree=True))
+            await rename(mi3)
+            await asyncio.sleep(0.01)
+
+        asyncio.run(run())
+        self.assertListEqual(["1: \uf269|\uf268", "2: ?"], get_names(mi3.cmd))
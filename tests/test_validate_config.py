@@ -1,4 +1,6 @@
+import io
 import unittest
+from unittest.mock import patch
 
 from i3_workspace_names_daemon import _validate_config, DEFAULT_APP_ICON_CONFIG
 
@@ -63,3 +65,15 @@ class TestValidateConfig(unittest.TestCase):
         config = {"appbla": {"transform_title": {"from": ":(.*(", "to": r"zyx",}}}
         err = _validate_config(config)
         self.assertTrue(err)
+
+    def test_match_on(self):
+        self.assertFalse(_validate_config({"app": {"icon": "file-pen", "match_on": ["window_class"]}}))
+        self.assertFalse(_validate_config({"app": {"icon": "file-pen", "match_on": "app_id"}}))
+        self.assertTrue(_validate_config({"app": {"icon": "file-pen", "match_on": ["class"]}}))
+        self.assertTrue(_validate_config({"app": {"icon": "file-pen", "match_on": 1}}))
+
+    def test_shadowed_rule_warns(self):
+        config = {"fire": "firefox", "firefox-dev": "firefox"}
+        with patch("i3_workspace_names_daemon.stderr", io.StringIO()) as err:
+            self.assertFalse(_validate_config(config))
+        self.assertIn("Rule 'firefox-dev' is never used, the earlier rule 'fire'", err.getvalue())